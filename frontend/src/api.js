@@ -22,6 +22,11 @@ export const analyzeLog = async (logText, useBraveSearch = true) => {
   }
 };
 
+export const fetchRawText = async (sha) => {
+  const response = await axios.get(`${API_BASE_URL}/api/raw/${sha}`);
+  return response.data.text;
+};
+
 export const checkHealth = async () => {
   try {
     const response = await axios.get(`${API_BASE_URL}/health`);
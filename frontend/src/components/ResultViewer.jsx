@@ -1,4 +1,5 @@
-import React from 'react';
+import React, { useState } from 'react';
+import { fetchRawText } from '../api';
 
 const getSeverityIcon = (severity) => {
   switch (severity) {
@@ -17,6 +18,42 @@ const getSeverityIcon = (severity) => {
   }
 };
 
+// Raw output is only referenced by hash in results; load it when opened
+const RawAnalysis = ({ sha }) => {
+  const [rawText, setRawText] = useState(null);
+  const [rawError, setRawError] = useState(null);
+
+  const handleToggle = async (event) => {
+    if (!event.currentTarget.open || rawText !== null) {
+      return;
+    }
+    try {
+      setRawText(await fetchRawText(sha));
+    } catch (err) {
+      setRawError('Raw analysis is no longer available');
+    }
+  };
+
+  return (
+    <details style={{ marginTop: '1rem' }} onToggle={handleToggle}>
+      <summary style={{ cursor: 'pointer', color: 'var(--text-secondary)', fontSize: '0.9rem' }}>
+        View Raw Analysis
+      </summary>
+      <pre style={{ 
+        marginTop: '0.5rem', 
+        padding: '1rem', 
+        background: 'rgba(0,0,0,0.3)', 
+        borderRadius: '4px',
+        overflow: 'auto',
+        fontSize: '0.85rem',
+        whiteSpace: 'pre-wrap'
+      }}>
+        {rawError || rawText || 'Loading...'}
+      </pre>
+    </details>
+  );
+};
+
 const ResultViewer = ({ result, isLoading, error }) => {
   if (isLoading) {
     return (
@@ -280,23 +317,8 @@ const ResultViewer = ({ result, isLoading, error }) => {
           </div>
         )}
 
-        {result.raw_analysis && (
-          <details style={{ marginTop: '1rem' }}>
-            <summary style={{ cursor: 'pointer', color: 'var(--text-secondary)', fontSize: '0.9rem' }}>
-              View Raw Analysis
-            </summary>
-            <pre style={{ 
-              marginTop: '0.5rem', 
-              padding: '1rem', 
-              background: 'rgba(0,0,0,0.3)', 
-              borderRadius: '4px',
-              overflow: 'auto',
-              fontSize: '0.85rem',
-              whiteSpace: 'pre-wrap'
-            }}>
-              {result.raw_analysis}
-            </pre>
-          </details>
+        {result.raw_analysis_sha && (
+          <RawAnalysis key={result.raw_analysis_sha} sha={result.raw_analysis_sha} />
         )}
       </div>
     </div>
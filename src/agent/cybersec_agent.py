@@ -1,15 +1,227 @@
 # CyberSec Agent - Main Agent Implementation
 import re
-from typing import Dict, Any, Optional, List
+import sys
+import atexit
+import asyncio
+import hashlib
+import threading
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator, Callable
+import orjson
+from cachetools import LRUCache
 from loguru import logger
 
-from ..clients.llm_client import LLMClient
+from ..clients.http_client import close_async_client
+from ..clients.llm_client import LLMClient, is_llm_error
 from ..tools.bert_tool import BertAnomalyTool
 from ..tools.brave_search_tool import BraveSearchTool
 from ..tools.duckduckgo_search_tool import DuckDuckGoSearchTool
-from .prompts import SYSTEM_PROMPT, get_analysis_prompt
+from .prompts import (
+    SYSTEM_PROMPT,
+    ANALYSIS_SCHEMA,
+    STRUCTURED_ANALYSIS_TEMPLATE,
+    AGENT_SUMMARY_SYSTEM_PROMPT,
+    AGENT_SUMMARY_TEMPLATE,
+    get_analysis_prompt
+)
 from ..config import settings
 
+try:
+    import uvloop
+except ImportError:  # Not available on Windows
+    uvloop = None
+
+
+# Compiled once at import; these run on every analysis
+# Section headers of the markdown analysis format, matched in a single pass
+_SECTION_RE = re.compile(
+    r'\*\*(THREAT TYPE|SEVERITY LEVEL|CONFIDENCE SCORE|DETAILED EXPLANATION|INDICATORS OF COMPROMISE|RECOMMENDED ACTIONS)\*\*'
+    r'\s*(?:\([^)\n]*\))?:?',
+    re.IGNORECASE
+)
+_WORD_RE = re.compile(r'\w+')
+_NUMBER_RE = re.compile(r'[\d.]+')
+# One list item per non-blank line, without its "-" / "*" bullet or "1." /
+# "2)" numbering (numbering must be followed by a space so IPs stay intact)
+_LIST_ITEM_RE = re.compile(r'^[ \t]*(?:[-*]+|\d+[.)](?=\s))?[ \t]*(\S.*?)[ \t\r]*$', re.MULTILINE)
+_SUMMARY_RE = re.compile(r'SUMMARY:\s*(.+?)(?=TOOL_CALLS:|$)', re.IGNORECASE | re.DOTALL)
+# Logs longer than this are returned by hash reference instead of inline
+_INLINE_TEXT_LIMIT = 1024
+# Literal markers of the TOOL/INPUT blocks; blocks are sliced between them
+# in one linear scan instead of a lazy DOTALL match per block
+_TOOL_MARKER_RE = re.compile(r'TOOL:|INPUT:|---', re.IGNORECASE)
+_TOOL_CALLS_NONE_RE = re.compile(r'TOOL_CALLS:\W*NONE\b', re.IGNORECASE)
+# Fallback keyword phrases in reporting order; a phrase's group decides where
+# its matches land in the extracted keywords
+_FALLBACK_GROUPS = [
+    ('sql injection', 'xss', 'command injection'),
+    ('brute force', 'password attack'),
+    ('ransomware', 'malware', 'trojan'),
+]
+_FALLBACK_PHRASE_GROUP = {
+    phrase: index
+    for index, phrases in enumerate(_FALLBACK_GROUPS)
+    for phrase in phrases
+}
+_CVE_GROUP = len(_FALLBACK_GROUPS)
+# Words behind the generic fallbacks when no phrase matched
+_FALLBACK_TRIGGERS = ('failed', 'password', 'login', 'unauthorized', 'injection')
+# One alternation covers every phrase, the CVE pattern and the trigger words,
+# so the log is scanned once; phrases come first so they win over triggers.
+# Patterns are lowercase and run on lowercased text, so no IGNORECASE (which
+# is ~8x slower here than lower() plus a case-sensitive scan). re already
+# skips ahead on the alternation's first characters, so a multi-pattern DFA
+# engine would only save a few microseconds per log
+_FALLBACK_RE = re.compile(
+    '|'.join(re.escape(p) for p in _FALLBACK_PHRASE_GROUP)
+    + r'|cve-\d{4}-\d{4,7}|'
+    + '|'.join(_FALLBACK_TRIGGERS)
+)
+# Variable parts of a log line that carry no security meaning (timestamps,
+# IPs and ports, UUIDs, long hex ids/hashes); masking them gives the template
+# that near-duplicate SIEM lines share. Other numbers (CVE ids, event and
+# status codes, uids) stay literal, so logs differing in them never share
+_VARIABLE_RE = re.compile(
+    r'\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?)?\b'
+    r'|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec) +\d{1,2} \d{2}:\d{2}:\d{2}\b'
+    r'|\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b'
+    r'|\b(?:\d{1,3}\.){3}\d{1,3}(?::\d{1,5})?\b'
+    r'|(?<=\bport )\d{1,5}\b|(?<=\bport=)\d{1,5}\b'
+    r'|\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b'
+    r'|\b0x[0-9a-f]+\b|\b[0-9a-f]{16,}\b',
+    re.IGNORECASE
+)
+# Scalar analysis fields that are complete in a partial JSON response once
+# the value is followed by a separator
+_PARTIAL_FIELD_RE = re.compile(
+    r'"(threat_type|severity|confidence_score)"\s*:\s*("(?:[^"\\]|\\.)*"|-?[\d.]+)\s*[,}\n]'
+)
+# Result fields that quote the log; template hits rewrite the variables in them
+_REBOUND_FIELDS = ("explanation", "indicators_of_compromise", "recommended_actions", "agent_summary")
+
+
+# Log template with the values it masked; computed once per analysis and
+# passed to both the template cache lookup and the store
+LogTemplate = Tuple[str, Tuple[str, ...]]
+
+
+def _log_template(text: str) -> LogTemplate:
+    """Split a log into its masked template and the variable values it masks"""
+    variables = tuple(_VARIABLE_RE.findall(text))
+    template = " ".join(_VARIABLE_RE.sub("<*>", text).split())
+    return template, variables
+
+
+def _rebind(value: Any, mapping: Dict[str, str]) -> Any:
+    """Replace variable values from a template's source log with the current log's"""
+    if isinstance(value, str):
+        return _VARIABLE_RE.sub(lambda m: mapping.get(m.group(0), m.group(0)), value)
+    if isinstance(value, list):
+        return [_rebind(item, mapping) for item in value]
+    return value
+
+
+def _scan_threat_phrases(text: str) -> Tuple[List[str], List[str], set]:
+    """
+    Scan text once for known attack phrases, CVE IDs and trigger words
+    
+    Returns:
+        Tuple of (keywords in reporting order, CVE IDs, trigger words seen)
+    """
+    groups = [[] for _ in range(_CVE_GROUP + 1)]
+    triggers = set()
+    
+    for match in _FALLBACK_RE.finditer(text.lower()):
+        found = match.group()
+        if found in _FALLBACK_PHRASE_GROUP:
+            groups[_FALLBACK_PHRASE_GROUP[found]].append(found)
+        elif found in _FALLBACK_TRIGGERS:
+            triggers.add(found)
+        else:
+            groups[_CVE_GROUP].append(found)
+    
+    keywords = [keyword for group in groups for keyword in group]
+    return keywords, groups[_CVE_GROUP], triggers
+
+
+def _parse_tool_calls(text: str) -> List[Tuple[str, str]]:
+    """
+    Extract (tool name, tool input) pairs from TOOL:/INPUT: blocks
+    
+    An input runs until the next TOOL:, a --- separator, or the end of text.
+    """
+    calls = []
+    name_start = None
+    input_start = None
+    name = None
+    
+    for marker in _TOOL_MARKER_RE.finditer(text):
+        token = marker.group().upper()
+        
+        if input_start is not None:
+            if token == 'INPUT:':
+                continue
+            tool_input = text[input_start:marker.start()].strip()
+            if tool_input:
+                calls.append((name, tool_input))
+            input_start = None
+        
+        if token == 'TOOL:':
+            name_start = marker.end()
+        elif token == 'INPUT:' and name_start is not None:
+            name = text[name_start:marker.start()].strip()
+            if _WORD_RE.fullmatch(name):
+                input_start = marker.end()
+            name_start = None
+        else:
+            name_start = None
+    
+    if input_start is not None:
+        tool_input = text[input_start:].strip()
+        if tool_input:
+            calls.append((name, tool_input))
+    
+    return calls
+
+
+# Sync wrappers run on one long-lived event loop per thread, so the loop's
+# keep-alive AsyncClient and service limiters carry over between calls;
+# every runner's client and loop are closed at interpreter exit
+_runner_local = threading.local()
+_runners: List[asyncio.Runner] = []
+_runners_lock = threading.Lock()
+
+
+def _get_runner() -> asyncio.Runner:
+    """Get this thread's runner, on uvloop where it is available"""
+    runner = getattr(_runner_local, "runner", None)
+    if runner is None:
+        loop_factory = uvloop.new_event_loop if uvloop is not None and sys.platform != "win32" else None
+        runner = asyncio.Runner(loop_factory=loop_factory)
+        _runner_local.runner = runner
+        with _runners_lock:
+            _runners.append(runner)
+    return runner
+
+
+def _run(coro):
+    """Run a coroutine to completion on this thread's long-lived event loop"""
+    return _get_runner().run(coro)
+
+
+@atexit.register
+def _close_runners() -> None:
+    """Close the AsyncClient and event loop of every runner"""
+    with _runners_lock:
+        runners = _runners[:]
+        _runners.clear()
+    for runner in runners:
+        try:
+            runner.run(close_async_client())
+        except Exception as e:
+            logger.debug("Could not close async client on exit: {}", e)
+        finally:
+            runner.close()
+
 
 class CyberSecAgent:
     """
@@ -38,7 +250,10 @@ class CyberSecAgent:
             self.llm_client = LLMClient(
                 base_url=settings.llm_base_url,
                 model=settings.llm_model,
-                temperature=0.7
+                temperature=0.7,
+                keep_alive=settings.llm_keep_alive,
+                max_concurrency=settings.llm_max_concurrency,
+                max_retries=settings.http_max_retries
             )
         else:
             self.llm_client = llm_client
@@ -56,148 +271,524 @@ class CyberSecAgent:
         
         self.verbose = verbose
         
+        # LLM keywords keyed by a hash of the log prefix the prompt sees;
+        # SIEM feeds repeat the same lines, so repeats skip a whole LLM call
+        self._keyword_cache: LRUCache = LRUCache(maxsize=settings.cache_size)
+        
+        # Full analysis results for exact-duplicate logs, keyed by a hash of
+        # the log and the search flag
+        self._result_cache: LRUCache = LRUCache(maxsize=max(settings.result_cache_size, 1))
+        
+        # Analyses keyed by log template, so repeats of the same event with
+        # other IPs, ports or timestamps skip every LLM call
+        self._template_cache: LRUCache = LRUCache(maxsize=max(settings.template_cache_size, 1))
+        
+        # Raw LLM output and long logs stay out of results; they are kept
+        # here by content hash and fetched on demand
+        self._raw_store: LRUCache = LRUCache(maxsize=max(settings.result_cache_size, 1))
+        
         # Store tools for agent use
         self.tools_map = {
             'bert_anomaly_detector': self.bert_tool,
             'brave_threat_intelligence' if settings.search_provider.lower() == 'brave' else 'duckduckgo_threat_intelligence': self.search_tool
         }
         
+        # Summary instructions and tool list never change after startup
+        self._summary_system_prompt = AGENT_SUMMARY_SYSTEM_PROMPT.format(
+            tool_descriptions="\n".join(
+                f"- {name}: {tool.description}"
+                for name, tool in self.tools_map.items()
+            )
+        )
+        
         logger.info("CyberSec Agent initialized successfully")
     
-    def analyze_log(
+    async def analyze_log(
         self,
         log_text: str,
-        use_brave_search: bool = True
+        use_brave_search: bool = True,
+        cache_bypass: bool = False
     ) -> Dict[str, Any]:
         """
         Analyze a security log
         
+        BERT detection and LLM threat keyword extraction are independent, so
+        they run concurrently; only the search and the final analysis wait on them.
+        Results for logs seen before are returned from the result cache, and
+        logs matching a cached template reuse its analysis.
+        
         Args:
             log_text: The log content to analyze
             use_brave_search: Whether to use Brave Search (default: True)
+            cache_bypass: Re-analyze even if a cached result exists
             
         Returns:
             Dictionary containing structured analysis results
         """
-        logger.info(f"Analyzing log (length: {len(log_text)} chars)")
+        logger.info("Analyzing log (length: {} chars)", len(log_text))
+        log_text = self._truncate(log_text)
+        template = self._template_of(log_text)
+        
+        if not cache_bypass:
+            cached = await self._lookup_result(log_text, use_brave_search, template)
+            if cached is not None:
+                return cached
+        
+        result = await self._analyze_one(log_text, use_brave_search)
+        self._store_result(log_text, use_brave_search, result, template)
+        return result
+    
+    async def analyze_log_stream(
+        self,
+        log_text: str,
+        use_brave_search: bool = True,
+        cache_bypass: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Analyze a security log, yielding results as they become available
+        
+        Partial events carry fields as soon as they are known: BERT data,
+        search sources, threat type, severity and confidence while the
+        analysis is still generating, then the full analysis before the
+        final agent summary runs. Cached analyses yield only the result.
+        
+        Args:
+            log_text: The log content to analyze
+            use_brave_search: Whether to use Brave Search (default: True)
+            cache_bypass: Re-analyze even if a cached result exists
+            
+        Yields:
+            {"event": "partial", "data": {...}} events, then one
+            {"event": "result", "data": {...}} with the complete analysis
+        """
+        logger.info("Streaming analysis of log (length: {} chars)", len(log_text))
+        log_text = self._truncate(log_text)
+        template = self._template_of(log_text)
+        
+        if not cache_bypass:
+            cached = await self._lookup_result(log_text, use_brave_search, template)
+            if cached is not None:
+                yield {"event": "result", "data": cached}
+                return
+        
+        partials: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(
+            self._analyze_one(log_text, use_brave_search, on_partial=partials.put_nowait)
+        )
+        task.add_done_callback(lambda _: partials.put_nowait(None))
+        
+        try:
+            while True:
+                partial = await partials.get()
+                if partial is None:
+                    break
+                yield {"event": "partial", "data": partial}
+            result = task.result()
+        finally:
+            # The client went away mid-stream; stop the pipeline with it
+            if not task.done():
+                task.cancel()
+        
+        self._store_result(log_text, use_brave_search, result, template)
+        yield {"event": "result", "data": result}
+    
+    def analyze_log_stream_sync(
+        self,
+        log_text: str,
+        on_partial: Callable[[Dict[str, Any]], None],
+        use_brave_search: bool = True,
+        cache_bypass: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Blocking wrapper around analyze_log_stream for callers without an event loop
+        
+        Args:
+            log_text: The log content to analyze
+            on_partial: Called with each partial event's fields as they arrive
+            use_brave_search: Whether to use Brave Search (default: True)
+            cache_bypass: Re-analyze even if a cached result exists
+            
+        Returns:
+            The complete analysis, as returned by analyze_log
+        """
+        async def consume() -> Dict[str, Any]:
+            result: Dict[str, Any] = {}
+            async for event in self.analyze_log_stream(log_text, use_brave_search, cache_bypass):
+                if event["event"] == "partial":
+                    on_partial(event["data"])
+                else:
+                    result = event["data"]
+            return result
+        
+        return _run(consume())
+    
+    def analyze_log_sync(
+        self,
+        log_text: str,
+        use_brave_search: bool = True,
+        cache_bypass: bool = False
+    ) -> Dict[str, Any]:
+        """Blocking wrapper around analyze_log for callers without an event loop"""
+        return _run(self.analyze_log(log_text, use_brave_search, cache_bypass))
+    
+    async def analyze_logs(
+        self,
+        logs: List[str],
+        use_brave_search: bool = True,
+        concurrency: int = 16,
+        cache_bypass: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze many security logs concurrently
+        
+        Cached and duplicate logs are resolved first, then BERT detection for
+        the remaining unique logs is sent through the batch endpoint up front,
+        and per-log LLM work runs with at most `concurrency` logs in flight so
+        Ollama can batch the overlapping generations. Start Ollama with
+        OLLAMA_NUM_PARALLEL set to the same value.
+        
+        Args:
+            logs: Log contents to analyze
+            use_brave_search: Whether to use threat intelligence search
+            concurrency: Maximum number of logs analyzed at the same time
+            cache_bypass: Re-analyze logs even if cached results exist
+            
+        Returns:
+            Analysis results in the same order as the input logs
+        """
+        logger.info("Analyzing batch of {} logs (concurrency: {})", len(logs), concurrency)
+        
+        logs = [log_text[:settings.max_log_length] for log_text in logs]
+        results: List[Optional[Dict[str, Any]]] = [
+            None if cache_bypass else self._cached_result(log_text, use_brave_search)
+            for log_text in logs
+        ]
+        
+        pending: Dict[str, List[int]] = {}
+        for i, (log_text, result) in enumerate(zip(logs, results)):
+            if result is None:
+                pending.setdefault(log_text, []).append(i)
+        
+        unique_logs = list(pending)
+        templates = {log_text: self._template_of(log_text) for log_text in unique_logs}
+        detections = await self.bert_tool.adetect_batch(unique_logs)
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def analyze(log_text: str, detection: Tuple[str, Optional[dict]]) -> Dict[str, Any]:
+            if not cache_bypass:
+                similar = await self._templated_result(log_text, use_brave_search, templates[log_text], detection)
+                if similar is not None:
+                    return similar
+            async with semaphore:
+                return await self._analyze_one(log_text, use_brave_search, detection)
+        
+        fresh = await asyncio.gather(*(
+            analyze(log_text, detection)
+            for log_text, detection in zip(unique_logs, detections)
+        ))
+        
+        for log_text, result in zip(unique_logs, fresh):
+            self._store_result(log_text, use_brave_search, result, templates[log_text])
+            for i in pending[log_text]:
+                results[i] = dict(result)
+        
+        return results
+    
+    def analyze_logs_sync(
+        self,
+        logs: List[str],
+        use_brave_search: bool = True,
+        concurrency: int = 16,
+        cache_bypass: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Blocking wrapper around analyze_logs for callers without an event loop"""
+        return _run(self.analyze_logs(logs, use_brave_search, concurrency, cache_bypass))
+    
+    def get_raw_text(self, sha: str) -> Optional[str]:
+        """
+        Look up raw analysis output or a long log by its content hash
         
-        # Truncate if too long
+        Args:
+            sha: raw_analysis_sha or log_text_sha from an analysis result
+            
+        Returns:
+            The stored text, or None if unknown or already evicted
+        """
+        return self._raw_store.get(sha)
+    
+    @staticmethod
+    def _truncate(log_text: str) -> str:
+        """Cut a log down to the configured maximum length"""
         if len(log_text) > settings.max_log_length:
-            log_text = log_text[:settings.max_log_length]
-            logger.warning(f"Log truncated to {settings.max_log_length} characters")
+            logger.warning("Log truncated to {} characters", settings.max_log_length)
+            return log_text[:settings.max_log_length]
+        return log_text
+    
+    async def _lookup_result(
+        self,
+        log_text: str,
+        use_brave_search: bool,
+        template: Optional[LogTemplate]
+    ) -> Optional[Dict[str, Any]]:
+        """Serve a log from the result cache, or from the template cache"""
+        cached = self._cached_result(log_text, use_brave_search)
+        if cached is not None:
+            logger.info("Analysis served from result cache")
+            return cached
+        
+        similar = await self._templated_result(log_text, use_brave_search, template)
+        if similar is not None:
+            logger.info("Analysis served from template cache")
+            self._store_result(log_text, use_brave_search, similar, template)
+        return similar
+    
+    def _store_raw(self, text: str) -> str:
+        """Keep text in the raw store and return its content hash"""
+        sha = hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=16).hexdigest()
+        if settings.result_cache_size > 0:
+            self._raw_store[sha] = text
+        return sha
+    
+    @staticmethod
+    def _result_key(log_text: str, use_brave_search: bool) -> bytes:
+        """Hash a log and the search flag into a result cache key"""
+        digest = hashlib.blake2b(log_text.encode("utf-8", "replace"), digest_size=16)
+        digest.update(b"\x01" if use_brave_search else b"\x00")
+        return digest.digest()
+    
+    def _cached_result(self, log_text: str, use_brave_search: bool) -> Optional[Dict[str, Any]]:
+        """Return a shallow copy of a cached analysis, if any"""
+        result = self._result_cache.get(self._result_key(log_text, use_brave_search))
+        return dict(result) if result is not None else None
+    
+    @staticmethod
+    def _is_cacheable(result: Dict[str, Any]) -> bool:
+        """Whether an analysis completed; failed analyses or summaries are never reused"""
+        return "error" not in result and "agent_error" not in result
+    
+    @staticmethod
+    def _template_of(log_text: str) -> Optional[LogTemplate]:
+        """The log's template, or None if the template cache is off or nothing is masked"""
+        if settings.template_cache_size <= 0:
+            return None
+        template = _log_template(log_text)
+        return template if template[1] else None
+    
+    def _store_result(
+        self,
+        log_text: str,
+        use_brave_search: bool,
+        result: Dict[str, Any],
+        template: Optional[LogTemplate] = None
+    ) -> None:
+        """Cache a finished analysis unless it failed, also under its template if given"""
+        if not self._is_cacheable(result):
+            return
+        if settings.result_cache_size > 0:
+            self._result_cache[self._result_key(log_text, use_brave_search)] = dict(result)
         
+        if template is not None:
+            masked, variables = template
+            self._template_cache[self._result_key(masked, use_brave_search)] = (variables, dict(result))
+    
+    async def _templated_result(
+        self,
+        log_text: str,
+        use_brave_search: bool,
+        template: Optional[LogTemplate],
+        detection: Optional[Tuple[str, Optional[dict]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reuse the analysis of a cached log with the same template
+        
+        The LLM output is shared; BERT data is this log's own, and masked
+        values (IPs, ports, timestamps, ids) quoted in the text fields are
+        swapped for this log's values. The source log's search is not
+        reported, since its query and sources may name the other log's values.
+        
+        Args:
+            log_text: The log content to analyze
+            use_brave_search: Whether to use threat intelligence search
+            template: The log's template from _template_of
+            detection: Precomputed (bert_result, bert_data) from a batch request
+            
+        Returns:
+            The adapted analysis, or None if no log with this template is cached
+        """
+        if template is None:
+            return None
+        masked, variables = template
+        entry = self._template_cache.get(self._result_key(masked, use_brave_search))
+        if entry is None:
+            return None
+        
+        source_variables, cached = entry
+        _, bert_data = await self._detect(log_text, detection)
+        
+        mapping = dict(zip(source_variables, variables))
+        result = {
+            key: _rebind(value, mapping) if key in _REBOUND_FIELDS else value
+            for key, value in cached.items()
+            if key not in ("log_text", "log_text_sha")
+        }
+        self._attach_log_text(result, log_text)
+        result["bert_data"] = bert_data
+        result["search_sources"] = []
+        result["search_query"] = None
+        return result
+    
+    def _attach_log_text(self, result: Dict[str, Any], log_text: str) -> None:
+        """Inline short logs in a result; long ones go by hash reference"""
+        if len(log_text) > _INLINE_TEXT_LIMIT:
+            result["log_text_sha"] = self._store_raw(log_text)
+        else:
+            result["log_text"] = log_text
+    
+    async def _detect(
+        self,
+        log_text: str,
+        detection: Optional[Tuple[str, Optional[dict]]] = None
+    ) -> Tuple[str, Optional[dict]]:
+        """Run BERT detection unless a batched result was already fetched"""
+        if detection is not None:
+            return detection
+        return await self.bert_tool.adetect(log_text)
+    
+    async def _analyze_one(
+        self,
+        log_text: str,
+        use_brave_search: bool,
+        detection: Optional[Tuple[str, Optional[dict]]] = None,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run the 5-step analysis on an already truncated log
+        
+        Args:
+            log_text: The log content to analyze
+            use_brave_search: Whether to use threat intelligence search
+            detection: Precomputed (bert_result, bert_data) from a batch request
+            on_partial: Called with result fields as soon as each is known
+            
+        Returns:
+            Dictionary containing structured analysis results
+        """
         try:
-            # Step 1: Run BERT anomaly detection
+            # Steps 1-2: BERT anomaly detection and threat keyword extraction in parallel
             if self.verbose:
                 print("\n[1/5] Running BERT anomaly detection...")
+                if use_brave_search:
+                    print("\n[2/5] Analyzing log to identify specific threats...")
             
-            bert_result = self.bert_tool._run(log_text)
-            bert_data = self.bert_tool.get_detection_data(log_text)
-            
-            # Step 2: Quick LLM analysis to identify threats for search
             threat_intel = ""
             search_sources = []
             search_query = None
             
+            # Keyword extraction is dropped if the BERT verdict settles the log.
+            # The regex keywords are known up front, so a speculative search
+            # on them runs alongside BERT and the LLM keyword call
+            keywords_task = None
+            speculative_query = None
+            speculative_task = None
             if use_brave_search:
-                if self.verbose:
-                    print("\n[2/5] Analyzing log to identify specific threats...")
+                scan = _scan_threat_phrases(log_text)
+                keywords_task = asyncio.ensure_future(self._extract_threat_keywords(log_text, scan))
+                speculative_query = self._extract_keywords_fallback(log_text, scan)
+                if speculative_query:
+                    speculative_task = asyncio.ensure_future(self._search(speculative_query))
+            
+            try:
+                bert_result, bert_data = await self._detect(log_text, detection)
                 
-                # Use LLM to extract specific threats from the log
-                keywords = self._extract_threat_keywords(log_text, bert_result)
+                shortcut = self._bert_shortcut(log_text, bert_data)
+                if shortcut is not None:
+                    logger.info("BERT verdict is decisive, skipping LLM analysis: {}", shortcut['threat_type'])
+                    return shortcut
                 
+                if on_partial is not None:
+                    on_partial({"bert_data": bert_data})
+                
+                keywords = await keywords_task if keywords_task is not None else None
+                
+                # Step 3: Search threat intelligence for the extracted keywords
                 if keywords:
                     if self.verbose:
                         print(f"\n[3/5] Searching threat intelligence for: {keywords}")
                     
-                    search_query = keywords
-                    threat_intel = self.search_tool._run(keywords)
-                    search_sources = self.search_tool.get_search_results(keywords)
+                    search_query, threat_intel, search_sources = await self._resolve_search(
+                        keywords, speculative_query, speculative_task
+                    )
                     
                     if self.verbose:
                         print(f"Found {len(search_sources)} threat intelligence sources")
+                    
+                    if on_partial is not None:
+                        on_partial({"search_query": search_query, "search_sources": search_sources})
+            finally:
+                for task in (keywords_task, speculative_task):
+                    if task is not None and not task.done():
+                        task.cancel()
             
             # Step 4: Generate comprehensive analysis with LLM
             if self.verbose:
                 print("\n[4/5] Generating comprehensive analysis...")
             
-            analysis_prompt = f"""{SYSTEM_PROMPT}
-
-Analyze the following security log:
-
-LOG CONTENT:
-{log_text}
-
-BERT ANOMALY DETECTION RESULTS:
-{bert_result}
-
-{f"THREAT INTELLIGENCE:{threat_intel}" if threat_intel else ""}
-
-Provide your structured analysis following this format:
-
-**THREAT TYPE**: [specific threat type]
-
-**SEVERITY LEVEL**: [CRITICAL/HIGH/MEDIUM/LOW/INFO]
-
-**CONFIDENCE SCORE**: [0.0 to 1.0]
-
-**DETAILED EXPLANATION**: 
-[Your detailed analysis]
-
-**INDICATORS OF COMPROMISE** (if applicable):
-- [IOC 1]
-- [IOC 2]
-
-**RECOMMENDED ACTIONS**:
-1. [Action 1]
-2. [Action 2]
-"""
+            analysis_prompt = STRUCTURED_ANALYSIS_TEMPLATE.format(
+                log_text=log_text,
+                bert_result=bert_result,
+                threat_intel=f"THREAT INTELLIGENCE:{threat_intel}" if threat_intel else ""
+            )
             
-            raw_output = self.llm_client.invoke(analysis_prompt)
+            # SYSTEM_PROMPT goes in its own chat message so Ollama reuses its
+            # cached prefix. Output is constrained to ANALYSIS_SCHEMA; stop
+            # generating as soon as the JSON object is closed
+            raw_output = await self.llm_client.ainvoke_until(
+                analysis_prompt,
+                lambda text: self._parse_json_analysis(text) is not None,
+                format=ANALYSIS_SCHEMA,
+                system=SYSTEM_PROMPT,
+                on_progress=self._partial_fields_reporter(on_partial) if on_partial is not None else None
+            )
+            if is_llm_error(raw_output):
+                # Reported as an error result, which is never cached
+                raise RuntimeError(raw_output.removeprefix("Error: "))
             
             # Parse the structured output
             parsed_result = self._parse_analysis(raw_output)
             
             # Add metadata
-            parsed_result["raw_analysis"] = raw_output
-            parsed_result["log_text"] = log_text
+            parsed_result["raw_analysis_sha"] = self._store_raw(raw_output)
+            self._attach_log_text(parsed_result, log_text)
             parsed_result["bert_data"] = bert_data
             parsed_result["search_sources"] = search_sources
             parsed_result["search_query"] = search_query
             
+            if on_partial is not None:
+                on_partial(dict(parsed_result))
+            
             # Step 5: Final LangChain agent summarization and autonomous tool calling
             if self.verbose:
                 print("\n[5/5] Running final LangChain agent for summarization and additional investigation...")
             
-            agent_result = self._run_final_agent_analysis(parsed_result, log_text)
+            agent_result = await self._run_final_agent_analysis(parsed_result, log_text)
             
             if agent_result:
                 parsed_result["agent_summary"] = agent_result.get("output", "")
-                
-                # Convert agent actions to serializable format
-                agent_actions = []
-                for action_info, observation in agent_result.get("intermediate_steps", []):
-                    if isinstance(action_info, dict):
-                        agent_actions.append({
-                            "tool": action_info.get("tool", "unknown"),
-                            "tool_input": str(action_info.get("tool_input", "")),
-                            "observation": str(observation)
-                        })
-                    else:
-                        # Handle tuple format from some LangChain versions
-                        agent_actions.append({
-                            "tool": getattr(action_info, 'tool', str(action_info)),
-                            "tool_input": str(getattr(action_info, 'tool_input', '')),
-                            "observation": str(observation)
-                        })
-                parsed_result["agent_actions"] = agent_actions
-            
-            logger.info(f"Analysis complete: {parsed_result.get('threat_type', 'Unknown')}, Severity: {parsed_result.get('severity', 'Unknown')}")
+                parsed_result["agent_actions"] = agent_result.get("agent_actions", [])
+                if agent_result.get("error"):
+                    parsed_result["agent_error"] = agent_result["error"]
+            
+            logger.info(
+                "Analysis complete: {}, Severity: {}",
+                parsed_result.get('threat_type', 'Unknown'),
+                parsed_result.get('severity', 'Unknown')
+            )
             
             return parsed_result
             
         except Exception as e:
-            logger.error(f"Error during log analysis: {e}")
+            logger.error("Error during log analysis: {}", e)
             return {
                 "threat_type": "Analysis Error",
                 "severity": "UNKNOWN",
@@ -207,7 +798,127 @@ Provide your structured analysis following this format:
                 "error": str(e)
             }
     
-    def _run_final_agent_analysis(self, initial_analysis: Dict[str, Any], log_text: str) -> Dict[str, Any]:
+    async def _search(self, query: str) -> Tuple[str, List[dict]]:
+        """Fetch formatted threat intelligence and its sources for a query with one search"""
+        return await self.search_tool.asearch(query)
+    
+    async def _resolve_search(
+        self,
+        keywords: str,
+        speculative_query: Optional[str],
+        speculative_task: Optional["asyncio.Future[Tuple[str, List[dict]]]"]
+    ) -> Tuple[str, str, List[dict]]:
+        """
+        Pick the threat intelligence search to use for the final keywords
+        
+        The speculative search is used as is when the keywords match its
+        query. Otherwise a search on the keywords is preferred, but once
+        search_refine_wait_ms has passed whichever search finishes first wins.
+        
+        Args:
+            keywords: Final threat keywords
+            speculative_query: Regex keywords the speculative search used
+            speculative_task: The speculative search, if one was started
+            
+        Returns:
+            Tuple of (query used, formatted threat intelligence, search sources)
+        """
+        if speculative_task is not None and keywords == speculative_query:
+            return (keywords, *await speculative_task)
+        
+        refined_task = asyncio.ensure_future(self._search(keywords))
+        if speculative_task is None:
+            return (keywords, *await refined_task)
+        
+        try:
+            await asyncio.wait({refined_task}, timeout=settings.search_refine_wait_ms / 1000)
+            if not refined_task.done():
+                await asyncio.wait({refined_task, speculative_task}, return_when=asyncio.FIRST_COMPLETED)
+            
+            if refined_task.done():
+                return (keywords, *refined_task.result())
+            
+            logger.info("Using speculative search results for '{}'", speculative_query)
+            return (speculative_query, *speculative_task.result())
+        finally:
+            refined_task.cancel()
+    
+    def _bert_shortcut(self, log_text: str, bert_data: Optional[dict]) -> Optional[Dict[str, Any]]:
+        """
+        Build the analysis for a log BERT scores far from its threshold
+        
+        Args:
+            log_text: The log content being analyzed
+            bert_data: Raw BERT detection data (None if detection failed)
+            
+        Returns:
+            The analysis result, or None if the LLM should analyze the log
+        """
+        if not settings.enable_bert_shortcut or not bert_data or bert_data["threshold"] <= 0:
+            return None
+        
+        ratio = bert_data["anomaly_score"] / bert_data["threshold"]
+        
+        if ratio < settings.bert_shortcut_normal_ratio:
+            result = {
+                "threat_type": "Normal Activity",
+                "severity": "INFO",
+                "confidence_score": round(1.0 - ratio, 2),
+                "explanation": (
+                    f"BERT scored this log at {bert_data['anomaly_score']:.2f}, far below the "
+                    f"anomaly threshold of {bert_data['threshold']:.2f}, so it was not sent for LLM analysis."
+                ),
+                "indicators_of_compromise": [],
+                "recommended_actions": []
+            }
+        elif ratio > settings.bert_shortcut_anomaly_ratio:
+            result = {
+                "threat_type": "Anomalous Activity",
+                "severity": "HIGH",
+                "confidence_score": 1.0,
+                "explanation": (
+                    f"BERT scored this log at {bert_data['anomaly_score']:.2f}, far above the "
+                    f"anomaly threshold of {bert_data['threshold']:.2f}. It was flagged without LLM "
+                    "analysis and requires review."
+                ),
+                "indicators_of_compromise": [],
+                "recommended_actions": [
+                    "Review the log entry and the activity around it",
+                    "Re-run the analysis with the BERT shortcut disabled for a detailed assessment"
+                ]
+            }
+        else:
+            return None
+        
+        self._attach_log_text(result, log_text)
+        result["bert_data"] = bert_data
+        result["search_sources"] = []
+        result["search_query"] = None
+        return result
+    
+    @staticmethod
+    def _partial_fields_reporter(on_partial: Callable[[Dict[str, Any]], None]) -> Callable[[str], None]:
+        """Build an on_progress callback reporting each scalar field of a streaming JSON analysis once"""
+        reported = set()
+        
+        def report(text: str) -> None:
+            fields = {}
+            for match in _PARTIAL_FIELD_RE.finditer(text):
+                key = match.group(1)
+                if key in reported:
+                    continue
+                try:
+                    value = orjson.loads(match.group(2))
+                except orjson.JSONDecodeError:
+                    continue
+                reported.add(key)
+                fields[key] = value.strip().upper() if key == "severity" else value
+            if fields:
+                on_partial(fields)
+        
+        return report
+    
+    async def _run_final_agent_analysis(self, initial_analysis: Dict[str, Any], log_text: str) -> Dict[str, Any]:
         """
         Run final agent to summarize and optionally investigate further using LangChain tools
         
@@ -216,106 +927,139 @@ Provide your structured analysis following this format:
             log_text: Original log text
             
         Returns:
-            Agent execution result with summary and any additional tool calls
+            Dict with the summary ("output") and serializable "agent_actions",
+            plus "error" if the summary could not be generated
         """
         try:
             # Build context for the agent
-            tool_descriptions = "\n".join([
-                f"- {name}: {tool.description}" 
-                for name, tool in self.tools_map.items()
-            ])
-            
-            context = f"""You have completed an initial security log analysis. Here are the results:
-
-**Threat Type**: {initial_analysis.get('threat_type', 'Unknown')}
-**Severity**: {initial_analysis.get('severity', 'Unknown')}
-**Confidence**: {initial_analysis.get('confidence_score', 0.0)}
-
-**Explanation**: {initial_analysis.get('explanation', 'N/A')[:500]}
-
-**Recommended Actions**:
-{chr(10).join(f"- {action}" for action in initial_analysis.get('recommended_actions', [])[:3])}
-
-**Original Log** (first 300 chars):
-{log_text[:300]}
-
-Your task:
-1. Provide a concise executive summary (2-3 sentences) of the threat and its implications
-2. If you need additional information, you can use these tools:
-{tool_descriptions}
-
-Format your response as:
-SUMMARY: [your 2-3 sentence executive summary]
-TOOL_CALLS: [any tool calls you want to make, or "NONE"]
-
-If you want to call a tool, use this format:
-TOOL: tool_name
-INPUT: tool input
----"""
+            context = AGENT_SUMMARY_TEMPLATE.format(
+                threat_type=initial_analysis.get('threat_type', 'Unknown'),
+                severity=initial_analysis.get('severity', 'Unknown'),
+                confidence_score=initial_analysis.get('confidence_score', 0.0),
+                explanation=initial_analysis.get('explanation', 'N/A')[:500],
+                recommended_actions="\n".join(f"- {action}" for action in initial_analysis.get('recommended_actions', [])[:3]),
+                log_excerpt=log_text[:300]
+            )
 
-            # Get LLM response
-            agent_response = self.llm_client.invoke(context)
+            # Get LLM response; nothing useful follows "TOOL_CALLS: NONE"
+            agent_response = await self.llm_client.ainvoke_until(
+                context,
+                lambda text: _TOOL_CALLS_NONE_RE.search(text) is not None,
+                system=self._summary_system_prompt
+            )
+            if is_llm_error(agent_response):
+                raise RuntimeError(agent_response.removeprefix("Error: "))
             
             # Parse response
-            summary_match = re.search(r'SUMMARY:\s*(.+?)(?=TOOL_CALLS:|$)', agent_response, re.DOTALL | re.IGNORECASE)
+            summary_match = _SUMMARY_RE.search(agent_response)
             summary = summary_match.group(1).strip() if summary_match else agent_response[:500]
             
-            # Check for tool calls
-            tool_calls = []
-            tool_matches = re.finditer(r'TOOL:\s*(\w+)\s+INPUT:\s*(.+?)(?=TOOL:|$|---)', agent_response, re.DOTALL | re.IGNORECASE)
-            
-            for match in tool_matches:
-                tool_name = match.group(1).strip()
-                tool_input = match.group(2).strip()
-                
-                if tool_name in self.tools_map:
-                    if self.verbose:
-                        print(f"\nAgent calling tool: {tool_name}")
-                        print(f"Input: {tool_input[:100]}...")
-                    
-                    try:
-                        tool = self.tools_map[tool_name]
-                        observation = tool._run(tool_input)
-                        tool_calls.append({
-                            "tool": tool_name,
-                            "tool_input": tool_input,
-                            "observation": observation
-                        })
-                        
-                        if self.verbose:
-                            print(f"Observation: {observation[:150]}...")
-                    except Exception as e:
-                        logger.warning(f"Tool call failed: {e}")
-                        tool_calls.append({
-                            "tool": tool_name,
-                            "tool_input": tool_input,
-                            "observation": f"Error: {str(e)}"
-                        })
+            # Run the requested tool calls concurrently; each waits on the network
+            requested = [
+                (tool_name, tool_input)
+                for tool_name, tool_input in _parse_tool_calls(agent_response)
+                if tool_name in self.tools_map
+            ]
+            observations = await asyncio.gather(*(
+                self._call_tool(tool_name, tool_input)
+                for tool_name, tool_input in requested
+            ))
+            tool_calls = [
+                {
+                    "tool": tool_name,
+                    "tool_input": tool_input,
+                    "observation": observation
+                }
+                for (tool_name, tool_input), observation in zip(requested, observations)
+            ]
             
             return {
                 "output": summary,
-                "intermediate_steps": [({"tool": tc["tool"], "tool_input": tc["tool_input"]}, tc["observation"]) for tc in tool_calls]
+                "agent_actions": tool_calls
             }
             
         except Exception as e:
-            logger.error(f"Error in final agent analysis: {e}")
+            logger.error("Error in final agent analysis: {}", e)
             return {
                 "output": f"Agent analysis skipped due to error: {str(e)}",
-                "intermediate_steps": []
+                "agent_actions": [],
+                "error": str(e)
             }
     
-    def _extract_threat_keywords(self, log_text: str, bert_result: str) -> str:
-        """Use LLM to extract specific threat keywords from log for targeted search"""
+    async def _call_tool(self, tool_name: str, tool_input: str) -> str:
+        """
+        Run one agent-requested tool call, returning the error text if it fails
+        
+        A plain INPUT is the tool's single text argument; a JSON object INPUT
+        is validated against the tool's input schema and passed as keyword
+        arguments, so the agent can set optional fields such as max_results.
+        """
+        if self.verbose:
+            print(f"\nAgent calling tool: {tool_name}")
+            print(f"Input: {tool_input[:100]}...")
+        
+        tool = self.tools_map[tool_name]
+        try:
+            args = self._tool_arguments(tool_input)
+            if args is None:
+                observation = await tool._arun(tool_input)
+            else:
+                observation = await tool._arun(**tool.args_schema(**args).model_dump())
+        except Exception as e:
+            logger.warning("Tool call failed: {}", e)
+            return f"Error: {str(e)}"
+        
+        if self.verbose:
+            print(f"Observation: {observation[:150]}...")
+        return observation
+    
+    @staticmethod
+    def _tool_arguments(tool_input: str) -> Optional[Dict[str, Any]]:
+        """Parse a JSON object tool input; None for plain text input"""
+        if not tool_input.startswith("{"):
+            return None
+        try:
+            args = orjson.loads(tool_input)
+        except orjson.JSONDecodeError:
+            return None
+        return args if isinstance(args, dict) else None
+    
+    async def _extract_threat_keywords(
+        self,
+        log_text: str,
+        scan: Optional[Tuple[List[str], List[str], set]] = None
+    ) -> str:
+        """
+        Use LLM to extract specific threat keywords from log for targeted search
+        
+        Runs alongside BERT detection, so the prompt only depends on the log itself.
+        Logs that name a CVE or at least two known attack phrases already
+        have specific keywords, so the LLM is skipped for them.
+        
+        Args:
+            log_text: The log content
+            scan: Result of _scan_threat_phrases(log_text) if already computed
+        """
+        if scan is None:
+            scan = _scan_threat_phrases(log_text)
+        keywords, cves, _ = scan
+        if cves or len(keywords) >= 2:
+            logger.debug("Threat keywords taken from known phrases, skipping LLM")
+            return ' '.join(keywords[:3])
+        
+        log_excerpt = log_text[:500]
+        cache_key = hashlib.blake2b(log_excerpt.encode("utf-8", "replace"), digest_size=16).digest()
+        cached = self._keyword_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Threat keywords served from cache")
+            return cached
         
         # Quick analysis to identify specific threats
         extraction_prompt = f"""Analyze this security log and identify the SPECIFIC threats or attack types present.
 Provide 2-3 precise search keywords/phrases that would help find threat intelligence.
 
 Log:
-{log_text[:500]}
-
-BERT Analysis:
-{bert_result[:200]}
+{log_excerpt}
 
 Provide ONLY the search keywords (e.g., "SSH brute force attack indicators", "CVE-2024-1234", "SQL injection attack patterns").
 Be specific and technical. Focus on attack types, CVEs, malware names, or specific techniques.
@@ -324,42 +1068,43 @@ Do NOT provide generic terms like "security log analysis".
 Search keywords:"""
         
         try:
-            keywords_output = self.llm_client.invoke(extraction_prompt)
+            keywords_output = await self.llm_client.ainvoke(extraction_prompt)
+            if is_llm_error(keywords_output):
+                raise RuntimeError(keywords_output.removeprefix("Error: "))
             # Clean up the output
             keywords = keywords_output.strip().replace('\n', ' ').replace('  ', ' ')
             # Take first 100 chars to avoid overly long queries
             keywords = keywords[:100].strip()
             
             if len(keywords) > 10:  # Valid keywords found
+                self._keyword_cache[cache_key] = keywords
                 return keywords
         except Exception as e:
-            logger.warning(f"Failed to extract keywords with LLM: {e}")
+            logger.warning("Failed to extract keywords with LLM: {}", e)
         
         # Fallback to basic extraction
-        return self._extract_keywords_fallback(log_text)
+        return self._extract_keywords_fallback(log_text, scan)
     
-    def _extract_keywords_fallback(self, log_text: str) -> str:
-        """Fallback regex-based keyword extraction"""
-        keywords = []
-        
-        patterns = [
-            r'(SQL injection|XSS|command injection)',
-            r'(brute force|password attack)',
-            r'(ransomware|malware|trojan)',
-            r'(CVE-\d{4}-\d{4,7})',
-        ]
+    def _extract_keywords_fallback(
+        self,
+        log_text: str,
+        scan: Optional[Tuple[List[str], List[str], set]] = None
+    ) -> str:
+        """
+        Fallback regex-based keyword extraction
         
-        text_lower = log_text.lower()
-        for pattern in patterns:
-            matches = re.findall(pattern, text_lower, re.IGNORECASE)
-            keywords.extend(matches)
+        Args:
+            log_text: The log content
+            scan: Result of _scan_threat_phrases(log_text) if already computed
+        """
+        keywords, _, triggers = scan if scan is not None else _scan_threat_phrases(log_text)
         
         if not keywords:
-            if 'failed' in text_lower and ('password' in text_lower or 'login' in text_lower):
+            if 'failed' in triggers and ('password' in triggers or 'login' in triggers):
                 return 'SSH authentication failure brute force'
-            elif 'unauthorized' in text_lower:
+            elif 'unauthorized' in triggers:
                 return 'unauthorized access attempt'
-            elif 'injection' in text_lower:
+            elif 'injection' in triggers:
                 return 'code injection attack'
         
         return ' '.join(keywords[:3]) if keywords else None
@@ -368,6 +1113,9 @@ Search keywords:"""
         """
         Parse the agent's structured output
         
+        The prompt asks for a JSON object; markdown **SECTION** output from
+        models that ignore it is still accepted.
+        
         Args:
             raw_output: Raw text output from agent
             
@@ -384,59 +1132,90 @@ Search keywords:"""
         }
         
         try:
-            # Extract threat type
-            threat_match = re.search(r'\*\*THREAT TYPE\*\*:?\s*(.+?)(?:\n|$)', raw_output, re.IGNORECASE)
-            if threat_match:
-                result["threat_type"] = threat_match.group(1).strip()
-            
-            # Extract severity
-            severity_match = re.search(r'\*\*SEVERITY LEVEL\*\*:?\s*(\w+)', raw_output, re.IGNORECASE)
-            if severity_match:
-                result["severity"] = severity_match.group(1).strip().upper()
-            
-            # Extract confidence
-            confidence_match = re.search(r'\*\*CONFIDENCE SCORE\*\*:?\s*([\d.]+)', raw_output, re.IGNORECASE)
-            if confidence_match:
-                result["confidence_score"] = float(confidence_match.group(1))
-            
-            # Extract explanation
-            explanation_match = re.search(
-                r'\*\*DETAILED EXPLANATION\*\*:?\s*(.+?)(?:\*\*|$)',
-                raw_output,
-                re.IGNORECASE | re.DOTALL
-            )
-            if explanation_match:
-                result["explanation"] = explanation_match.group(1).strip()
-            
-            # Extract IoCs
-            ioc_match = re.search(
-                r'\*\*INDICATORS OF COMPROMISE\*\*:?\s*(.+?)(?:\*\*|$)',
-                raw_output,
-                re.IGNORECASE | re.DOTALL
-            )
-            if ioc_match:
-                ioc_text = ioc_match.group(1).strip()
-                # Split by lines and clean
-                iocs = [line.strip('- ').strip() for line in ioc_text.split('\n') if line.strip()]
-                result["indicators_of_compromise"] = [ioc for ioc in iocs if ioc]
-            
-            # Extract recommended actions
-            actions_match = re.search(
-                r'\*\*RECOMMENDED ACTIONS\*\*:?\s*(.+?)(?:\*\*|$)',
-                raw_output,
-                re.IGNORECASE | re.DOTALL
-            )
-            if actions_match:
-                actions_text = actions_match.group(1).strip()
-                # Split by lines and clean
-                actions = [re.sub(r'^\d+\.?\s*', '', line).strip('- ').strip() 
-                          for line in actions_text.split('\n') if line.strip()]
-                result["recommended_actions"] = [action for action in actions if action]
+            parsed = self._parse_json_analysis(raw_output)
+            if parsed is None:
+                parsed = self._parse_markdown_analysis(raw_output)
+            result.update(parsed)
         
         except Exception as e:
-            logger.warning(f"Error parsing analysis output: {e}")
+            logger.warning("Error parsing analysis output: {}", e)
         
         return result
+    
+    def _parse_json_analysis(self, raw_output: str) -> Optional[Dict[str, Any]]:
+        """Parse the JSON object between the first '{' and the last '}' of the output"""
+        start = raw_output.find('{')
+        end = raw_output.rfind('}')
+        if start == -1 or end < start:
+            return None
+        
+        try:
+            data = orjson.loads(raw_output[start:end + 1])
+        except orjson.JSONDecodeError:
+            return None
+        
+        if not isinstance(data, dict):
+            return None
+        
+        parsed = {}
+        if data.get("threat_type"):
+            parsed["threat_type"] = str(data["threat_type"]).strip()
+        if data.get("severity"):
+            parsed["severity"] = str(data["severity"]).strip().upper()
+        if data.get("confidence_score") is not None:
+            try:
+                parsed["confidence_score"] = float(data["confidence_score"])
+            except (TypeError, ValueError):
+                pass
+        if data.get("explanation"):
+            parsed["explanation"] = str(data["explanation"]).strip()
+        for key in ("indicators_of_compromise", "recommended_actions"):
+            if isinstance(data.get(key), list):
+                items = [str(item).strip() for item in data[key]]
+                parsed[key] = [item for item in items if item]
+        
+        return parsed or None
+    
+    def _parse_markdown_analysis(self, raw_output: str) -> Dict[str, Any]:
+        """Parse **SECTION**: output by slicing between headers found in one scan"""
+        headers = list(_SECTION_RE.finditer(raw_output))
+        sections = {}
+        for i, header in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(raw_output)
+            sections.setdefault(header.group(1).upper(), raw_output[header.end():end].strip())
+        
+        parsed = {}
+        
+        # Extract threat type
+        if sections.get("THREAT TYPE"):
+            parsed["threat_type"] = sections["THREAT TYPE"].split('\n', 1)[0].strip()
+        
+        # Extract severity
+        severity_match = _WORD_RE.match(sections.get("SEVERITY LEVEL", ""))
+        if severity_match:
+            parsed["severity"] = severity_match.group(0).upper()
+        
+        # Extract confidence
+        confidence_match = _NUMBER_RE.match(sections.get("CONFIDENCE SCORE", ""))
+        if confidence_match:
+            try:
+                parsed["confidence_score"] = float(confidence_match.group(0))
+            except ValueError:
+                pass
+        
+        # Extract explanation
+        if sections.get("DETAILED EXPLANATION"):
+            parsed["explanation"] = sections["DETAILED EXPLANATION"]
+        
+        # Extract IoCs
+        if "INDICATORS OF COMPROMISE" in sections:
+            parsed["indicators_of_compromise"] = _LIST_ITEM_RE.findall(sections["INDICATORS OF COMPROMISE"])
+        
+        # Extract recommended actions
+        if "RECOMMENDED ACTIONS" in sections:
+            parsed["recommended_actions"] = _LIST_ITEM_RE.findall(sections["RECOMMENDED ACTIONS"])
+        
+        return parsed
 
 
 # Example usage
@@ -456,11 +1235,11 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         # Use command line argument
         log = " ".join(sys.argv[1:])
-        result = agent.analyze_log(log)
+        result = agent.analyze_log_sync(log)
     else:
         # Use first test log
         log = test_logs[0]
-        result = agent.analyze_log(log)
+        result = agent.analyze_log_sync(log)
     
     print("\n" + "="*70)
     print("ANALYSIS RESULTS")
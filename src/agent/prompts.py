@@ -15,41 +15,95 @@ ANALYSIS WORKFLOW:
 4. Synthesize all information into a comprehensive threat assessment
 
 OUTPUT FORMAT:
-You must provide a structured analysis with these sections:
+Respond with a JSON object with these keys:
+- threat_type: Specific type of threat (e.g., "Brute Force Attack", "SQL Injection", "Malware Execution", "Normal Activity")
+- severity: One of CRITICAL (active exploitation, system compromise, data breach), HIGH (attempted exploitation, privilege escalation attempts), MEDIUM (suspicious activity, potential reconnaissance), LOW (minor anomalies, policy violations), INFO (normal activity, informational logs)
+- confidence_score: Your confidence in this assessment (0.0 to 1.0)
+- explanation: What happened in the log, why it's concerning (or not), context from threat intelligence, and your interpretation of the BERT anomaly score
+- indicators_of_compromise: IP addresses, ports, attack signatures and CVE references, if any
+- recommended_actions: Specific actions in priority order: immediate actions (for CRITICAL/HIGH), short-term remediation, long-term preventive measures
 
-**THREAT TYPE**: Specific type of threat (e.g., "Brute Force Attack", "SQL Injection", "Malware Execution", "Normal Activity")
+Be precise, technical, and actionable. Use the tools effectively to gather comprehensive intelligence.
+"""
 
-**SEVERITY LEVEL**: One of [CRITICAL, HIGH, MEDIUM, LOW, INFO]
-- CRITICAL: Active exploitation, system compromise, data breach
-- HIGH: Attempted exploitation, privilege escalation attempts
-- MEDIUM: Suspicious activity, potential reconnaissance
-- LOW: Minor anomalies, policy violations
-- INFO: Normal activity, informational logs
 
-**CONFIDENCE SCORE**: Your confidence in this assessment (0.0 to 1.0)
+# JSON schema passed to Ollama's `format` so the analysis is always a
+# parseable object with these keys
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "threat_type": {"type": "string"},
+        "severity": {"type": "string", "enum": ["CRITICAL", "HIGH", "MEDIUM", "LOW", "INFO"]},
+        "confidence_score": {"type": "number", "minimum": 0.0, "maximum": 1.0},
+        "explanation": {"type": "string"},
+        "indicators_of_compromise": {"type": "array", "items": {"type": "string"}},
+        "recommended_actions": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": [
+        "threat_type",
+        "severity",
+        "confidence_score",
+        "explanation",
+        "indicators_of_compromise",
+        "recommended_actions"
+    ]
+}
+
+
+# Templates are filled with str.format on every analysis. The analysis
+# template is the user message; SYSTEM_PROMPT is sent separately and the
+# JSON keys are enforced through ANALYSIS_SCHEMA
+STRUCTURED_ANALYSIS_TEMPLATE = """Analyze the following security log:
 
-**DETAILED EXPLANATION**: 
-- What happened in the log
-- Why it's concerning (or not)
-- Context from threat intelligence
-- BERT anomaly analysis interpretation
+LOG CONTENT:
+{log_text}
 
-**INDICATORS OF COMPROMISE** (if applicable):
-- IP addresses
-- Ports
-- Attack signatures
-- CVE references
+BERT ANOMALY DETECTION RESULTS:
+{bert_result}
 
-**RECOMMENDED ACTIONS**:
-Prioritized list of specific actions to take:
-1. Immediate actions (for CRITICAL/HIGH)
-2. Short-term remediation
-3. Long-term preventive measures
+{threat_intel}
 
-Be precise, technical, and actionable. Use the tools effectively to gather comprehensive intelligence.
+Respond with the JSON object described in the output format.
 """
 
 
+# The summary instructions and tool list never change after startup, so they
+# go first as a system message and Ollama reuses their cached prefix; only
+# the analysis results below them differ per log
+AGENT_SUMMARY_SYSTEM_PROMPT = """You review completed security log analyses.
+
+Your task:
+1. Provide a concise executive summary (2-3 sentences) of the threat and its implications
+2. If you need additional information, you can use these tools:
+{tool_descriptions}
+
+Format your response as:
+SUMMARY: [your 2-3 sentence executive summary]
+TOOL_CALLS: [any tool calls you want to make, or "NONE"]
+
+If you want to call a tool, use this format:
+TOOL: tool_name
+INPUT: tool input
+---"""
+
+
+AGENT_SUMMARY_TEMPLATE = """You have completed an initial security log analysis. Here are the results:
+
+**Threat Type**: {threat_type}
+**Severity**: {severity}
+**Confidence**: {confidence_score}
+
+**Explanation**: {explanation}
+
+**Recommended Actions**:
+{recommended_actions}
+
+**Original Log** (first 300 chars):
+{log_excerpt}
+
+Respond with the executive summary and tool calls in the format described above."""
+
+
 ANALYSIS_PROMPT_TEMPLATE = """Analyze the following security log entry:
 
 LOG CONTENT:
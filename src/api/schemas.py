@@ -1,5 +1,5 @@
 # API Schemas
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 
 
@@ -37,6 +37,10 @@ class LogAnalysisRequest(BaseModel):
         default=True,
         description="Whether to use Brave Search for threat intelligence"
     )
+    cache_bypass: bool = Field(
+        default=False,
+        description="Re-analyze the log even if a cached result exists"
+    )
 
 
 class LogAnalysisResponse(BaseModel):
@@ -53,9 +57,9 @@ class LogAnalysisResponse(BaseModel):
         default=[],
         description="Recommended actions to take"
     )
-    raw_analysis: Optional[str] = Field(
+    raw_analysis_sha: Optional[str] = Field(
         default=None,
-        description="Raw analysis output from the agent"
+        description="Content hash of the raw analysis output, fetch it from /api/raw/{sha}"
     )
     bert_data: Optional[BertAnomalyData] = Field(
         default=None,
@@ -77,10 +81,34 @@ class LogAnalysisResponse(BaseModel):
         default=[],
         description="Additional tool calls made by the autonomous agent"
     )
+    agent_error: Optional[str] = Field(
+        default=None,
+        description="Error message if the agent summary could not be generated"
+    )
     error: Optional[str] = Field(
         default=None,
         description="Error message if analysis failed"
     )
+    
+    @classmethod
+    def content_from_result(cls, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Shape an agent result like this model without validating it
+        
+        The agent's parser already produces every field with the right type,
+        so responses skip pydantic validation and only get missing optional
+        fields filled in and extra keys dropped.
+        """
+        return {
+            name: result[name] if name in result else field.get_default(call_default_factory=True)
+            for name, field in cls.model_fields.items()
+        }
+
+
+class RawTextResponse(BaseModel):
+    """Raw text stored by content hash"""
+    sha: str = Field(description="Content hash of the text")
+    text: str = Field(description="The stored text")
 
 
 class HealthResponse(BaseModel):
@@ -1,13 +1,17 @@
 # FastAPI Server for CyberSec Agent
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from loguru import logger
 import sys
+import asyncio
+import orjson
 
-from .schemas import LogAnalysisRequest, LogAnalysisResponse, HealthResponse
+from .schemas import LogAnalysisRequest, LogAnalysisResponse, RawTextResponse, HealthResponse
 from ..agent.cybersec_agent import CyberSecAgent
-from ..clients.bert_client import BertClient
+from ..tools.bert_tool import get_shared_bert_client
+from ..clients.http_client import close_async_client
 from ..config import settings
 
 
@@ -20,13 +24,69 @@ logger.add(
 )
 
 
+# Agent created by the lifespan handler before the first request
+agent: CyberSecAgent = None
+
+
+def get_agent() -> CyberSecAgent:
+    """Get the agent instance created at startup"""
+    if agent is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Agent is not initialized"
+        )
+    return agent
+
+
+async def warm_up(agent_instance: CyberSecAgent) -> None:
+    """Load the BERT and LLM models and open keep-alive connections to both"""
+    logger.info("Warming up BERT API and LLM...")
+    bert_result, llm_result = await asyncio.gather(
+        agent_instance.bert_tool.bert_client.detect_anomaly_async("warmup"),
+        agent_instance.llm_client.awarm(),
+        return_exceptions=True
+    )
+    
+    if isinstance(bert_result, Exception):
+        logger.warning("BERT API warmup failed: {}", bert_result)
+    elif bert_result.get("error"):
+        logger.warning("BERT API warmup failed: {}", bert_result['error'])
+    if isinstance(llm_result, Exception):
+        logger.warning("LLM warmup failed: {}", llm_result)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the agent and warm up its services before serving requests"""
+    global agent
+    
+    logger.info("Starting CyberSec Agent API")
+    logger.info("LLM URL: {}", settings.llm_base_url)
+    logger.info("BERT API URL: {}", settings.bert_api_url)
+    logger.info("Search Provider: {}", settings.search_provider)
+    if settings.search_provider.lower() == "brave":
+        logger.info("Brave API configured: {}", bool(settings.brave_api_key and settings.brave_api_key != 'your_brave_api_key_here'))
+    
+    agent = CyberSecAgent(verbose=False)
+    logger.info("Agent initialized successfully")
+    
+    if settings.api_warmup:
+        await warm_up(agent)
+    
+    yield
+    
+    await close_async_client()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="CyberSec Agent API",
     description="AI-powered security log analysis using LangChain, BERT, and Brave Search",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 
@@ -40,37 +100,6 @@ app.add_middleware(
 )
 
 
-# Initialize agent (lazy loading)
-agent: CyberSecAgent = None
-
-
-def get_agent() -> CyberSecAgent:
-    """Get or create agent instance"""
-    global agent
-    if agent is None:
-        logger.info("Initializing CyberSec Agent...")
-        agent = CyberSecAgent(verbose=False)
-    return agent
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
-    logger.info("Starting CyberSec Agent API")
-    logger.info(f"LLM URL: {settings.llm_base_url}")
-    logger.info(f"BERT API URL: {settings.bert_api_url}")
-    logger.info(f"Search Provider: {settings.search_provider}")
-    if settings.search_provider.lower() == "brave":
-        logger.info(f"Brave API configured: {bool(settings.brave_api_key and settings.brave_api_key != 'your_brave_api_key_here')}")
-    
-    # Pre-initialize agent
-    try:
-        get_agent()
-        logger.info("Agent initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize agent: {e}")
-
-
 @app.get("/", response_model=dict)
 async def root():
     """Root endpoint"""
@@ -79,6 +108,8 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "analyze": "/api/analyze",
+            "analyze_stream": "/api/analyze/stream",
+            "raw": "/api/raw/{sha}",
             "health": "/health",
             "docs": "/docs"
         }
@@ -90,8 +121,7 @@ async def health_check():
     """Health check endpoint"""
     
     # Check BERT API
-    bert_client = BertClient(settings.bert_api_url)
-    bert_healthy = bert_client.check_health()
+    bert_healthy = await get_shared_bert_client().acheck_health()
     
     return HealthResponse(
         status="healthy" if bert_healthy else "degraded",
@@ -115,33 +145,80 @@ async def analyze_log(request: LogAnalysisRequest):
     Returns structured threat analysis with severity, explanation, and recommendations.
     """
     try:
-        logger.info(f"Received analysis request (log length: {len(request.log_text)} chars)")
+        logger.info("Received analysis request (log length: {} chars)", len(request.log_text))
         
         # Get agent
         agent_instance = get_agent()
         
         # Analyze log
-        result = agent_instance.analyze_log(
+        result = await agent_instance.analyze_log(
             log_text=request.log_text,
-            use_brave_search=request.use_brave_search
+            use_brave_search=request.use_brave_search,
+            cache_bypass=request.cache_bypass
         )
         
-        # Return response
-        return LogAnalysisResponse(**result)
+        # Return response; the result is already well-typed, so it is not re-validated
+        return ORJSONResponse(LogAnalysisResponse.content_from_result(result))
         
     except Exception as e:
-        logger.error(f"Error during log analysis: {e}")
+        logger.error("Error during log analysis: {}", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Analysis failed: {str(e)}"
         )
 
 
+@app.post("/api/analyze/stream")
+async def analyze_log_stream(request: LogAnalysisRequest):
+    """
+    Analyze a security log, streaming results as newline-delimited JSON
+    
+    Each line is {"event": "partial", "data": {...}} with fields known so far
+    (BERT data, search sources, threat type, severity, ...), and the last line
+    is {"event": "result", "data": {...}} shaped like the /api/analyze response.
+    """
+    logger.info("Received streaming analysis request (log length: {} chars)", len(request.log_text))
+    
+    agent_instance = get_agent()
+    
+    async def events():
+        try:
+            async for event in agent_instance.analyze_log_stream(
+                log_text=request.log_text,
+                use_brave_search=request.use_brave_search,
+                cache_bypass=request.cache_bypass
+            ):
+                if event["event"] == "result":
+                    event["data"] = LogAnalysisResponse.content_from_result(event["data"])
+                yield orjson.dumps(event) + b"\n"
+        except Exception as e:
+            logger.error("Error during streaming log analysis: {}", e)
+            yield orjson.dumps({"event": "error", "data": {"detail": f"Analysis failed: {str(e)}"}}) + b"\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.get("/api/raw/{sha}", response_model=RawTextResponse)
+async def get_raw_text(sha: str):
+    """
+    Fetch raw analysis output (or a long log) referenced by an analysis result
+    
+    Texts are held in a bounded in-memory store, so old hashes may be gone.
+    """
+    text = get_agent().get_raw_text(sha)
+    if text is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown or expired raw text hash"
+        )
+    return RawTextResponse(sha=sha, text=text)
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler"""
-    logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    logger.error("Unhandled exception: {}", exc)
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal server error"}
     )
@@ -151,9 +228,14 @@ async def global_exception_handler(request, exc):
 if __name__ == "__main__":
     import uvicorn
     
+    # uvloop and httptools come with uvicorn[standard]; uvloop has no
+    # Windows build. Multiple workers need the app as an import string
     uvicorn.run(
-        app,
+        "src.api.server:app" if settings.api_workers > 1 else app,
         host=settings.api_host,
         port=settings.api_port,
+        workers=settings.api_workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level=settings.log_level.lower()
     )
@@ -1,7 +1,10 @@
 # Command-Line Interface for CyberSec Agent
 import sys
 import os
+from itertools import islice
+from typing import Tuple
 from pathlib import Path
+from cachetools import LRUCache
 from loguru import logger
 
 # Add parent directory to path for imports
@@ -11,9 +14,31 @@ from src.agent.cybersec_agent import CyberSecAgent
 from src.config import settings
 
 
-def print_banner():
-    """Print application banner"""
-    banner = """
+# Large read buffer so big log files are pulled in with few syscalls
+READ_BUFFER_SIZE = 1 << 20
+
+
+def read_log_file(file_path: str) -> Tuple[str, int]:
+    """
+    Read a log file for analysis without loading more than the agent uses
+    
+    Only max_log_length + 1 characters are read; the extra character lets
+    the agent see that the log was truncated.
+    
+    Args:
+        file_path: Path to the log file
+        
+    Returns:
+        Tuple of (beginning of the file, file size in bytes)
+        
+    Raises:
+        FileNotFoundError: If the file does not exist
+    """
+    with open(file_path, 'r', encoding='utf-8', buffering=READ_BUFFER_SIZE) as f:
+        return f.read(settings.max_log_length + 1), os.fstat(f.fileno()).st_size
+
+
+_BANNER = """
 ╔══════════════════════════════════════════════════════════════╗
 ║                    CyberSec Agent CLI                        ║
 ║          AI-Powered Security Log Analysis System             ║
@@ -24,70 +49,182 @@ Configuration:
   BERT API: {bert_url}
   Brave Search: {brave_status}
 
-""".format(
-        llm_url=settings.llm_base_url,
-        llm_model=settings.llm_model,
-        bert_url=settings.bert_api_url,
-        brave_status="✓ Enabled" if settings.brave_api_key and settings.brave_api_key != "your_brave_api_key_here" else "✗ Not configured"
-    )
-    print(banner)
+"""
+
+_SEP = "=" * 70
+_DASH = "-" * 70
+
+# ANSI colors for severity levels
+_SEVERITY_COLORS = {
+    'CRITICAL': '\033[91m',  # Red
+    'HIGH': '\033[93m',      # Yellow
+    'MEDIUM': '\033[94m',    # Blue
+    'LOW': '\033[92m',       # Green
+    'INFO': '\033[96m'       # Cyan
+}
+_RESET = '\033[0m'
+
+
+# Files analyzed in interactive mode, remembered by path, mtime and size
+FILE_RESULT_CACHE_SIZE = 32
+
+
+def print_banner():
+    """Print application banner"""
+    print(_BANNER.format_map({
+        "llm_url": settings.llm_base_url,
+        "llm_model": settings.llm_model,
+        "bert_url": settings.bert_api_url,
+        "brave_status": "✓ Enabled" if settings.brave_api_key and settings.brave_api_key != "your_brave_api_key_here" else "✗ Not configured"
+    }))
 
 
 def print_separator():
     """Print separator line"""
-    print("=" * 70)
+    print(_SEP)
 
 
 def format_result(result: dict):
     """Format and print analysis result"""
-    print_separator()
-    print("ANALYSIS RESULTS")
-    print_separator()
-    
-    # Threat Type
-    print(f"\n🎯 THREAT TYPE: {result.get('threat_type', 'Unknown')}")
-    
     # Severity with color coding (using ANSI colors)
     severity = result.get('severity', 'UNKNOWN')
-    severity_colors = {
-        'CRITICAL': '\033[91m',  # Red
-        'HIGH': '\033[93m',      # Yellow
-        'MEDIUM': '\033[94m',    # Blue
-        'LOW': '\033[92m',       # Green
-        'INFO': '\033[96m'       # Cyan
-    }
-    color = severity_colors.get(severity, '\033[0m')
-    reset = '\033[0m'
-    print(f"⚠️  SEVERITY: {color}{severity}{reset}")
-    
-    # Confidence
-    confidence = result.get('confidence_score', 0.0)
-    confidence_pct = confidence * 100
-    print(f"📊 CONFIDENCE: {confidence_pct:.1f}%")
+    color = _SEVERITY_COLORS.get(severity, _RESET)
     
-    # Explanation
-    print(f"\n📝 DETAILED EXPLANATION:")
-    print("-" * 70)
+    confidence_pct = result.get('confidence_score', 0.0) * 100
     explanation = result.get('explanation', 'No explanation available')
-    print(explanation)
+    
+    # The report is assembled first and written to stdout in one call
+    lines = [
+        _SEP,
+        "ANALYSIS RESULTS",
+        _SEP,
+        f"\n🎯 THREAT TYPE: {result.get('threat_type', 'Unknown')}",
+        f"⚠️  SEVERITY: {color}{severity}{_RESET}",
+        f"📊 CONFIDENCE: {confidence_pct:.1f}%",
+        "\n📝 DETAILED EXPLANATION:",
+        _DASH,
+        explanation
+    ]
     
     # Indicators of Compromise
     iocs = result.get('indicators_of_compromise', [])
     if iocs:
-        print(f"\n🔍 INDICATORS OF COMPROMISE:")
-        print("-" * 70)
-        for i, ioc in enumerate(iocs, 1):
-            print(f"  {i}. {ioc}")
+        lines += ["\n🔍 INDICATORS OF COMPROMISE:", _DASH]
+        lines.extend(f"  {i}. {ioc}" for i, ioc in enumerate(iocs, 1))
     
     # Recommended Actions
     actions = result.get('recommended_actions', [])
     if actions:
-        print(f"\n✅ RECOMMENDED ACTIONS:")
-        print("-" * 70)
-        for i, action in enumerate(actions, 1):
-            print(f"  {i}. {action}")
+        lines += ["\n✅ RECOMMENDED ACTIONS:", _DASH]
+        lines.extend(f"  {i}. {action}" for i, action in enumerate(actions, 1))
     
-    print_separator()
+    lines.append(_SEP)
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def progress_printer():
+    """Build an on_partial callback printing each analysis field the first time it arrives"""
+    shown = set()
+    
+    def show(fields: dict):
+        lines = []
+        
+        bert_data = fields.get('bert_data')
+        if bert_data and 'bert_data' not in shown:
+            verdict = "anomalous" if bert_data.get('is_anomaly') else "normal"
+            lines.append(f"   BERT: score {bert_data.get('anomaly_score', 0.0):.2f} ({verdict})")
+        
+        if 'search_query' in fields and 'search_query' not in shown:
+            sources = fields.get('search_sources') or []
+            lines.append(f"   Threat intel: '{fields['search_query']}' ({len(sources)} sources)")
+        
+        if 'threat_type' in fields and 'threat_type' not in shown:
+            lines.append(f"   Threat type: {fields['threat_type']}")
+        
+        if 'severity' in fields and 'severity' not in shown:
+            severity = fields['severity']
+            lines.append(f"   Severity: {_SEVERITY_COLORS.get(severity, _RESET)}{severity}{_RESET}")
+        
+        confidence = fields.get('confidence_score')
+        if isinstance(confidence, (int, float)) and 'confidence_score' not in shown:
+            lines.append(f"   Confidence: {confidence * 100:.1f}%")
+        
+        if 'explanation' in fields and 'explanation' not in shown:
+            lines.append("   Writing summary...")
+        
+        shown.update(fields)
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+    
+    return show
+
+
+_HELP_TEXT = """
+Available commands:
+  help              - Show this help message
+  file <path>       - Analyze a log file
+  quit/exit/q       - Exit the application
+  
+  Or simply enter log text to analyze it directly.
+                """
+
+
+def _do_help() -> bool:
+    """Show the interactive commands"""
+    print(_HELP_TEXT)
+    return False
+
+
+def _do_quit() -> bool:
+    """Leave interactive mode"""
+    print("\nGoodbye!")
+    return True
+
+
+# Interactive commands without arguments; handlers return True to exit
+_COMMANDS = {
+    'quit': _do_quit,
+    'exit': _do_quit,
+    'q': _do_quit,
+    'help': _do_help
+}
+
+
+def interactive_file(agent: CyberSecAgent, file_path: str, file_results: LRUCache):
+    """Analyze a log file from interactive mode, reusing results for unchanged files"""
+    try:
+        with open(file_path, 'r', encoding='utf-8', buffering=READ_BUFFER_SIZE) as f:
+            stat = os.fstat(f.fileno())
+            key = (os.path.realpath(file_path), stat.st_mtime_ns, stat.st_size)
+            result = file_results.get(key)
+            if result is None:
+                log_text = f.read(settings.max_log_length + 1)
+        
+        print(f"\n📄 Analyzing file: {file_path}")
+        print(f"   Size: {stat.st_size} bytes")
+        
+        if result is None:
+            result = agent.analyze_log_sync(log_text)
+            if "error" not in result:
+                file_results[key] = result
+        else:
+            print("   Unchanged since the last analysis, showing its results")
+        
+        format_result(result)
+        
+    except FileNotFoundError:
+        print(f"❌ Error: File not found: {file_path}")
+    except Exception as e:
+        print(f"❌ Error reading file: {e}")
+
+
+def interactive_text(agent: CyberSecAgent, log_text: str):
+    """Analyze log text from interactive mode, showing findings as they arrive"""
+    print(f"\n🔍 Analyzing log...")
+    
+    result = agent.analyze_log_stream_sync(log_text, progress_printer())
+    format_result(result)
 
 
 def interactive_mode(agent: CyberSecAgent):
@@ -97,6 +234,9 @@ def interactive_mode(agent: CyberSecAgent):
     print("Type 'file <path>' to analyze a log file")
     print("Type 'help' for more commands\n")
     
+    # Re-running 'file <path>' on an unchanged file reuses its result
+    file_results: LRUCache = LRUCache(maxsize=FILE_RESULT_CACHE_SIZE)
+    
     while True:
         try:
             # Get input
@@ -106,51 +246,17 @@ def interactive_mode(agent: CyberSecAgent):
                 continue
             
             # Handle commands
-            if user_input.lower() in ['quit', 'exit', 'q']:
-                print("\nGoodbye!")
-                break
-            
-            elif user_input.lower() == 'help':
-                print("""
-Available commands:
-  help              - Show this help message
-  file <path>       - Analyze a log file
-  quit/exit/q       - Exit the application
-  
-  Or simply enter log text to analyze it directly.
-                """)
-                continue
+            command = user_input.lower()
+            handler = _COMMANDS.get(command)
+            if handler is not None:
+                if handler():
+                    break
             
-            elif user_input.lower().startswith('file '):
-                # Analyze file
-                file_path = user_input[5:].strip()
-                
-                if not os.path.exists(file_path):
-                    print(f"❌ Error: File not found: {file_path}")
-                    continue
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        log_text = f.read()
-                    
-                    print(f"\n📄 Analyzing file: {file_path}")
-                    print(f"   Size: {len(log_text)} characters")
-                    
-                    # Analyze
-                    result = agent.analyze_log(log_text)
-                    format_result(result)
-                    
-                except Exception as e:
-                    print(f"❌ Error reading file: {e}")
-                continue
+            elif command.startswith('file '):
+                interactive_file(agent, user_input[5:].strip(), file_results)
             
             else:
-                # Analyze log text
-                log_text = user_input
-                
-                print(f"\n🔍 Analyzing log...")
-                result = agent.analyze_log(log_text)
-                format_result(result)
+                interactive_text(agent, user_input)
         
         except KeyboardInterrupt:
             print("\n\nInterrupted. Type 'quit' to exit.")
@@ -162,20 +268,54 @@ Available commands:
 
 def analyze_file(agent: CyberSecAgent, file_path: str):
     """Analyze a log file"""
-    if not os.path.exists(file_path):
-        print(f"❌ Error: File not found: {file_path}")
-        sys.exit(1)
-    
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            log_text = f.read()
+        log_text, size = read_log_file(file_path)
         
         print(f"📄 Analyzing file: {file_path}")
-        print(f"   Size: {len(log_text)} characters\n")
+        print(f"   Size: {size} bytes\n")
         
-        result = agent.analyze_log(log_text)
+        result = agent.analyze_log_sync(log_text)
         format_result(result)
         
+    except FileNotFoundError:
+        print(f"❌ Error: File not found: {file_path}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        logger.exception("Error analyzing file")
+        sys.exit(1)
+
+
+def analyze_file_lines(agent: CyberSecAgent, file_path: str):
+    """
+    Analyze each line of a log file as a separate log
+    
+    The file is read lazily, one BERT batch worth of lines at a time, and
+    each batch's results are printed before the next is read, so memory
+    stays flat and output starts after the first batch.
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8', buffering=READ_BUFFER_SIZE) as f:
+            print(f"📄 Analyzing file line by line: {file_path}\n")
+            
+            lines = (line.strip() for line in f)
+            lines = (line for line in lines if line)
+            batch_size = max(settings.bert_batch_size, 1)
+            count = 0
+            
+            # BERT detection for each chunk goes through the batch endpoint
+            while chunk := list(islice(lines, batch_size)):
+                results = agent.analyze_logs_sync(chunk)
+                for line, result in zip(chunk, results):
+                    count += 1
+                    print(f"\n[{count}] {line[:100]}")
+                    format_result(result)
+            
+            print(f"\n   Lines analyzed: {count}")
+        
+    except FileNotFoundError:
+        print(f"❌ Error: File not found: {file_path}")
+        sys.exit(1)
     except Exception as e:
         print(f"❌ Error: {e}")
         logger.exception("Error analyzing file")
@@ -187,7 +327,7 @@ def analyze_text(agent: CyberSecAgent, log_text: str):
     print(f"🔍 Analyzing log text ({len(log_text)} characters)...\n")
     
     try:
-        result = agent.analyze_log(log_text)
+        result = agent.analyze_log_sync(log_text)
         format_result(result)
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -229,12 +369,15 @@ Usage:
   python -m src.cli.main <log_text>         # Analyze log text
   python -m src.cli.main -f <file>          # Analyze log file
   python -m src.cli.main --file <file>      # Analyze log file
+  python -m src.cli.main -l <file>          # Analyze each line of a log file
+  python -m src.cli.main --lines <file>     # Analyze each line of a log file
   python -m src.cli.main -h, --help         # Show this help
 
 Examples:
   python -m src.cli.main "Failed login from 192.168.1.1"
   python -m src.cli.main -f /var/log/auth.log
   python -m src.cli.main --file suspicious.log
+  python -m src.cli.main --lines /var/log/auth.log
         """)
     
     elif sys.argv[1] in ['-f', '--file']:
@@ -246,6 +389,14 @@ Examples:
         file_path = sys.argv[2]
         analyze_file(agent, file_path)
     
+    elif sys.argv[1] in ['-l', '--lines']:
+        # Line-by-line file mode
+        if len(sys.argv) < 3:
+            print("❌ Error: Please specify a file path")
+            sys.exit(1)
+        
+        analyze_file_lines(agent, sys.argv[2])
+    
     else:
         # Direct text mode
         log_text = ' '.join(sys.argv[1:])
@@ -1,32 +1,140 @@
 # BERT Anomaly Detection Client
+import asyncio
+import gzip
+import hashlib
+import weakref
 import requests
-from typing import Dict, Any, Optional
+import httpx
+import orjson
+from typing import Dict, Any, Optional, List, Tuple, Set
+from cachetools import LRUCache
 from loguru import logger
 
+from .http_client import JSON_HEADERS, get_async_client, get_limiter, get_session, send_with_retry
+
+
+# Smaller bodies are sent as-is; compressing them saves less than it costs
+GZIP_MIN_BYTES = 1024
+
+GZIP_JSON_HEADERS = {**JSON_HEADERS, "Content-Encoding": "gzip"}
+
+# Reported in place of a detection when the BERT API could not score a log
+_ERROR_BASE = {"anomaly_score": 0.0, "is_anomaly": False, "threshold": 10.5}
+
+
+def _detection_result(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert one BERT API detection into a client result"""
+    return {
+        "anomaly_score": data.get("anomaly_score", 0.0),
+        "is_anomaly": data.get("is_anomaly", False),
+        "threshold": data.get("threshold", 10.5),
+        "error": None
+    }
+
+
+def _error_result(error: Exception) -> Dict[str, Any]:
+    """Log a failed BERT request and build the result reported for it"""
+    if isinstance(error, (requests.exceptions.Timeout, httpx.TimeoutException)):
+        error_msg = "BERT API request timed out"
+    elif isinstance(error, (requests.exceptions.RequestException, httpx.HTTPError)):
+        error_msg = f"BERT API request failed: {str(error)}"
+    else:
+        error_msg = f"Unexpected error during BERT detection: {str(error)}"
+    logger.error(error_msg)
+    return {**_ERROR_BASE, "error": error_msg}
+
 
 class BertClient:
     """Client for communicating with BERT anomaly detection API"""
     
-    def __init__(self, api_url: str, timeout: int = 30):
+    def __init__(
+        self,
+        api_url: str,
+        timeout: int = 30,
+        cache_size: int = 4096,
+        batch_size: int = 32,
+        batch_wait: float = 0.0,
+        max_concurrency: int = 16,
+        max_retries: int = 3,
+        gzip_requests: bool = False
+    ):
         """
         Initialize BERT client
         
         Args:
             api_url: Base URL of BERT API (e.g., http://localhost:7000)
             timeout: Request timeout in seconds
+            cache_size: Number of detection results kept for repeated log lines
+            batch_size: Maximum logs coalesced into one batch request
+            batch_wait: Seconds concurrent async requests wait to be coalesced
+                into one batch request (0 sends each request on its own)
+            max_concurrency: Maximum async requests in flight to the BERT API
+            max_retries: Retries when the BERT API answers 429/502/503/504
+            gzip_requests: Gzip request bodies over GZIP_MIN_BYTES (the BERT
+                API must accept Content-Encoding: gzip)
         """
         self.api_url = api_url.rstrip('/')
         self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.gzip_requests = gzip_requests
         self.health_endpoint = f"{self.api_url}/health"
         self.detect_endpoint = f"{self.api_url}/detect-anomaly"
+        self.batch_endpoint = f"{self.api_url}/detect-anomaly-batch"
+        
+        # Cleared once the BERT API reports it has no batch endpoint
+        self.batch_supported = True
+        
+        # Identical log lines always score the same, so successful results
+        # are kept by content hash and repeats skip the API entirely
+        self._cache: LRUCache = LRUCache(maxsize=cache_size)
+        
+        # Async requests queued per event loop until the batch fills up or
+        # batch_wait elapses, then sent as a single batch request
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._queued: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, List[Tuple[str, asyncio.Future]]]" = weakref.WeakKeyDictionary()
+        self._timers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.TimerHandle]" = weakref.WeakKeyDictionary()
+        self._dispatches: Set[asyncio.Task] = set()
+        
+    @staticmethod
+    def _cache_key(log_text: str) -> bytes:
+        """Hash log text into a compact cache key"""
+        return hashlib.blake2b(log_text.encode("utf-8", "replace"), digest_size=16).digest()
+    
+    def _cached(self, log_text: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached result for log_text, if any"""
+        result = self._cache.get(self._cache_key(log_text))
+        return dict(result) if result is not None else None
+    
+    def _encode(self, payload: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+        """Serialize a request body, gzipped if enabled and large enough"""
+        body = orjson.dumps(payload)
+        if self.gzip_requests and len(body) > GZIP_MIN_BYTES:
+            return gzip.compress(body, compresslevel=1), GZIP_JSON_HEADERS
+        return body, JSON_HEADERS
+    
+    def _store(self, log_text: str, result: Dict[str, Any]) -> None:
+        """Cache a detection result unless it carries an error"""
+        if result.get("error") is None:
+            self._cache[self._cache_key(log_text)] = dict(result)
         
     def check_health(self) -> bool:
         """Check if BERT API is available"""
         try:
-            response = requests.get(self.health_endpoint, timeout=5)
+            response = get_session().get(self.health_endpoint, timeout=5)
             return response.status_code == 200
         except Exception as e:
-            logger.warning(f"BERT API health check failed: {e}")
+            logger.warning("BERT API health check failed: {}", e)
+            return False
+    
+    async def acheck_health(self) -> bool:
+        """Async version of check_health on the shared AsyncClient, without retries"""
+        try:
+            response = await get_async_client().get(self.health_endpoint, timeout=5)
+            return response.status_code == 200
+        except Exception as e:
+            logger.warning("BERT API health check failed: {}", e)
             return False
     
     def detect_anomaly(self, log_text: str) -> Dict[str, Any]:
@@ -43,55 +151,207 @@ class BertClient:
                 - threshold: float
                 - error: Optional[str]
         """
+        cached = self._cached(log_text)
+        if cached is not None:
+            logger.debug("BERT result served from cache")
+            return cached
+        
         try:
-            logger.debug(f"Sending log to BERT API: {log_text[:100]}...")
+            logger.opt(lazy=True).debug("Sending log to BERT API: {}...", lambda: log_text[:100])
             
-            response = requests.post(
+            body, headers = self._encode({"log_text": log_text})
+            response = get_session().post(
                 self.detect_endpoint,
-                json={"log_text": log_text},
+                data=body,
+                headers=headers,
                 timeout=self.timeout
             )
             response.raise_for_status()
             
-            data = response.json()
-            logger.info(f"BERT anomaly detection: score={data.get('anomaly_score')}, is_anomaly={data.get('is_anomaly')}")
+            data = orjson.loads(response.content)
+            logger.info("BERT anomaly detection: score={}, is_anomaly={}", data.get('anomaly_score'), data.get('is_anomaly'))
             
-            return {
-                "anomaly_score": data.get("anomaly_score", 0.0),
-                "is_anomaly": data.get("is_anomaly", False),
-                "threshold": data.get("threshold", 10.5),
-                "error": None
-            }
+            result = _detection_result(data)
+            self._store(log_text, result)
+            return result
             
-        except requests.exceptions.Timeout:
-            error_msg = "BERT API request timed out"
-            logger.error(error_msg)
-            return {
-                "anomaly_score": 0.0,
-                "is_anomaly": False,
-                "threshold": 10.5,
-                "error": error_msg
-            }
-            
-        except requests.exceptions.RequestException as e:
-            error_msg = f"BERT API request failed: {str(e)}"
-            logger.error(error_msg)
-            return {
-                "anomaly_score": 0.0,
-                "is_anomaly": False,
-                "threshold": 10.5,
-                "error": error_msg
-            }
+        except Exception as e:
+            return _error_result(e)
+
+    async def detect_anomaly_async(self, log_text: str) -> Dict[str, Any]:
+        """
+        Async version of detect_anomaly using the shared keep-alive client
+        
+        With batch_wait set, concurrent calls are coalesced into one request
+        to the batch endpoint.
+        
+        Args:
+            log_text: The log text to analyze
+            
+        Returns:
+            Same dictionary shape as detect_anomaly
+        """
+        cached = self._cached(log_text)
+        if cached is not None:
+            logger.debug("BERT result served from cache")
+            return cached
+        
+        if self.batch_wait > 0 and self.batch_supported:
+            return await self._enqueue(log_text)
+        
+        result = await self._request_single(log_text)
+        self._store(log_text, result)
+        return result
+    
+    def _enqueue(self, log_text: str) -> "asyncio.Future[Dict[str, Any]]":
+        """Queue a log for the next coalesced batch request"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        queued = self._queued.setdefault(loop, [])
+        queued.append((log_text, future))
+        if len(queued) >= self.batch_size:
+            self._flush(loop)
+        elif len(queued) == 1:
+            self._timers[loop] = loop.call_later(self.batch_wait, self._flush, loop)
+        
+        return future
+    
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Send everything queued on loop as one batch request"""
+        # A batch that filled up before batch_wait must not leave its timer
+        # behind to cut the next batch short
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+        
+        queued = self._queued.pop(loop, None)
+        if not queued:
+            return
+        
+        task = loop.create_task(self._dispatch(queued))
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, queued: List[Tuple[str, asyncio.Future]]) -> None:
+        """Resolve queued futures from a single batch request"""
+        try:
+            results = await self.detect_anomaly_batch_async([log_text for log_text, _ in queued])
+        except Exception as e:
+            for _, future in queued:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(queued, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def _request_single(self, log_text: str) -> Dict[str, Any]:
+        """Send one log to the single-log endpoint"""
+        try:
+            logger.opt(lazy=True).debug("Sending log to BERT API (async): {}...", lambda: log_text[:100])
+            
+            body, headers = self._encode({"log_text": log_text})
+            async with get_limiter("bert", self.max_concurrency):
+                response = await send_with_retry(
+                    "POST",
+                    self.detect_endpoint,
+                    max_retries=self.max_retries,
+                    content=body,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content)
+            logger.info("BERT anomaly detection: score={}, is_anomaly={}", data.get('anomaly_score'), data.get('is_anomaly'))
+            
+            return _detection_result(data)
+            
+        except Exception as e:
+            return _error_result(e)
+
+    async def detect_anomaly_batch_async(self, log_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Detect anomalies for several logs in one request to the batch endpoint
+        
+        Cached and duplicate log lines are resolved locally, so only distinct
+        unseen logs are sent to the API.
+        
+        Args:
+            log_texts: The log texts to analyze
+            
+        Returns:
+            List of dicts shaped like detect_anomaly results, in input order
+        """
+        results: List[Optional[Dict[str, Any]]] = [self._cached(t) for t in log_texts]
+        
+        pending: Dict[str, List[int]] = {}
+        for i, (log_text, result) in enumerate(zip(log_texts, results)):
+            if result is None:
+                pending.setdefault(log_text, []).append(i)
+        
+        if pending:
+            unique_texts = list(pending)
+            fresh = await self._request_batch(unique_texts)
+            for log_text, result in zip(unique_texts, fresh):
+                self._store(log_text, result)
+                for i in pending[log_text]:
+                    results[i] = dict(result)
+        
+        return results
+
+    async def _request_batch(self, log_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Send log texts to the batch endpoint
+        
+        The BERT API pads the batch into a single forward pass. Servers without
+        /detect-anomaly-batch fall back to concurrent single-log requests.
+        """
+        if not log_texts:
+            return []
+        
+        if not self.batch_supported:
+            return await asyncio.gather(*(self._request_single(t) for t in log_texts))
+        
+        try:
+            logger.debug("Sending batch of {} logs to BERT API", len(log_texts))
+            
+            body, headers = self._encode({"log_texts": log_texts})
+            async with get_limiter("bert", self.max_concurrency):
+                response = await send_with_retry(
+                    "POST",
+                    self.batch_endpoint,
+                    max_retries=self.max_retries,
+                    content=body,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+            
+            if response.status_code in (404, 405):
+                logger.warning("BERT API has no batch endpoint, falling back to single requests")
+                self.batch_supported = False
+                return await asyncio.gather(*(self._request_single(t) for t in log_texts))
+            
+            response.raise_for_status()
+            
+            results = orjson.loads(response.content).get("results", [])
+            if len(results) != len(log_texts):
+                raise ValueError(f"expected {len(log_texts)} results, got {len(results)}")
+            
+            logger.opt(lazy=True).info(
+                "BERT batch anomaly detection: {}/{} anomalous",
+                lambda: sum(1 for r in results if r.get('is_anomaly')),
+                lambda: len(results)
+            )
+            
+            return [_detection_result(data) for data in results]
             
         except Exception as e:
-            error_msg = f"Unexpected error during BERT detection: {str(e)}"
+            error_msg = f"BERT API batch request failed: {str(e)}"
             logger.error(error_msg)
-            return {
-                "anomaly_score": 0.0,
-                "is_anomaly": False,
-                "threshold": 10.5,
-                "error": error_msg
-            }
+            return [{**_ERROR_BASE, "error": error_msg} for _ in log_texts]
 
 
 # Example usage
@@ -0,0 +1,214 @@
+# Shared HTTP Client Management
+import asyncio
+import random
+import threading
+import time
+import weakref
+from typing import Dict
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from loguru import logger
+
+from ..config import settings
+
+try:
+    import h2  # HTTP/2 support for httpx (installed with httpx[http2])
+except ImportError:
+    h2 = None
+
+
+# HTTP/2 is negotiated over TLS only, so HTTPS APIs such as Brave Search
+# multiplex concurrent queries on one connection while the plain-HTTP BERT
+# and Ollama services keep using HTTP/1.1
+ASYNC_HTTP2 = h2 is not None
+
+# Keep-alive pool shared by every async client in the process
+ASYNC_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=32)
+
+# Keep-alive connections held per host by the sync session
+SYNC_POOL_SIZE = 32
+
+# Request bodies are pre-serialized with orjson and sent as raw content
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Throttled, overloaded or gateway responses that are worth retrying after a backoff
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+# Upper bound on a single retry wait, whatever Retry-After a server sends
+MAX_RETRY_DELAY = 30.0
+
+
+class CappedRetry(Retry):
+    """urllib3 Retry whose waits, Retry-After included, never exceed MAX_RETRY_DELAY"""
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, MAX_RETRY_DELAY)
+    
+    def get_backoff_time(self) -> float:
+        return min(super().get_backoff_time(), MAX_RETRY_DELAY)
+
+
+# Same policy for the sync session; every request sent through it (BERT
+# detection, searches, health checks) is safe to repeat, POST included.
+# Refused connections get one quick retry (a dropped keep-alive socket) so
+# health checks of a down service still fail fast. The last response is
+# returned rather than raised so callers keep their raise_for_status handling
+SYNC_RETRY = CappedRetry(
+    total=settings.http_max_retries,
+    connect=1,
+    read=0,
+    backoff_factor=0.5,
+    status_forcelist=sorted(RETRY_STATUSES),
+    allowed_methods=frozenset({"GET", "POST"}),
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
+
+# httpx.AsyncClient connections are bound to the event loop that opened them,
+# so one client is kept per running loop and dropped when the loop goes away
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the keep-alive AsyncClient for the running event loop
+
+    Returns:
+        Shared httpx.AsyncClient bound to the current loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(limits=ASYNC_LIMITS, http2=ASYNC_HTTP2)
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client() -> None:
+    """Close the AsyncClient of the running event loop, if one was opened"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+# Semaphores capping concurrent calls per service; like the clients they are
+# bound to the loop they are used on, so each loop gets its own set
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+def get_limiter(name: str, limit: int) -> asyncio.Semaphore:
+    """
+    Get the semaphore capping concurrent calls to a service on the running loop
+    
+    Args:
+        name: Service name shared by all callers of that service (e.g. "llm")
+        limit: Maximum concurrent calls, fixed by the first caller on each loop
+    
+    Returns:
+        Shared asyncio.Semaphore for the service
+    """
+    limiters = _limiters.setdefault(asyncio.get_running_loop(), {})
+    limiter = limiters.get(name)
+    if limiter is None:
+        limiter = asyncio.Semaphore(limit)
+        limiters[name] = limiter
+    return limiter
+
+
+class TokenBucket:
+    """Thread-safe token bucket pacing blocking calls to a rate-limited service"""
+    
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize the bucket full
+        
+        Args:
+            rate: Calls allowed per second on average
+            burst: Calls allowed back to back before pacing starts
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """
+        Take a token, sleeping until it is available
+        
+        Callers reserve tokens under the lock and sleep outside it, so
+        concurrent callers are spaced 1/rate apart.
+        
+        Returns:
+            Seconds waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a throttled response, honoring Retry-After up to MAX_RETRY_DELAY"""
+    retry_after = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return min(float(retry_after), MAX_RETRY_DELAY)
+    return min(random.uniform(0.5, 1.5) * 2 ** attempt, MAX_RETRY_DELAY)
+
+
+async def send_with_retry(method: str, url: str, max_retries: int = 3, **kwargs) -> httpx.Response:
+    """
+    Send a request with the shared async client, retrying throttled responses
+    
+    429/502/503/504 responses are retried up to max_retries times with jittered
+    exponential backoff; the last response is returned either way.
+    
+    Args:
+        method: HTTP method
+        url: Request URL
+        max_retries: Retries after the first attempt
+        **kwargs: Passed to httpx.AsyncClient.request
+    
+    Returns:
+        The final httpx.Response
+    """
+    client = get_async_client()
+    for attempt in range(max_retries + 1):
+        response = await client.request(method, url, **kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+            return response
+        delay = retry_delay(response, attempt)
+        logger.warning("{} returned {}, retrying in {:.1f}s", url, response.status_code, delay)
+        await asyncio.sleep(delay)
+
+
+def _build_session() -> requests.Session:
+    """Create a requests session with a keep-alive pool per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=SYNC_POOL_SIZE, max_retries=SYNC_RETRY)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Reusing one session keeps TCP/TLS connections open between sync calls
+_session = _build_session()
+
+
+def get_session() -> requests.Session:
+    """
+    Get the process-wide keep-alive session for sync requests
+
+    Returns:
+        Shared requests.Session
+    """
+    return _session
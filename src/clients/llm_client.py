@@ -1,14 +1,48 @@
 # LLM Client for Ollama
-from typing import Optional
+import asyncio
+import functools
+from contextlib import aclosing
+from typing import Optional, AsyncIterator, Callable, Union, Dict, Any
+import orjson
 from langchain_ollama import OllamaLLM
 from langchain_core.language_models.llms import BaseLLM
 from loguru import logger
 
+from .http_client import JSON_HEADERS, RETRY_STATUSES, get_async_client, get_limiter, retry_delay, send_with_retry
+
+
+# Calls return this instead of a response when the LLM could not be reached
+LLM_ERROR_PREFIX = "Error: LLM invocation failed"
+
+
+def is_llm_error(text: str) -> bool:
+    """Whether an LLMClient call returned its error message instead of a response"""
+    return text.startswith(LLM_ERROR_PREFIX)
+
+
+@functools.lru_cache(maxsize=8)
+def _shared_llm(base_url: str, model: str, temperature: float, keep_alive: str) -> OllamaLLM:
+    """Sync LangChain Ollama LLM shared by every client with the same settings"""
+    return OllamaLLM(
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        keep_alive=keep_alive
+    )
+
 
 class LLMClient:
     """Client for interacting with Ollama LLM"""
     
-    def __init__(self, base_url: str, model: str, temperature: float = 0.7):
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        temperature: float = 0.7,
+        keep_alive: str = "30m",
+        max_concurrency: int = 16,
+        max_retries: int = 3
+    ):
         """
         Initialize LLM client
         
@@ -16,18 +50,22 @@ class LLMClient:
             base_url: Ollama base URL (e.g., http://localhost:11434)
             model: Model name (e.g., llama3.2)
             temperature: Sampling temperature (0.0 to 1.0)
+            keep_alive: How long Ollama keeps the model, and its prompt cache, loaded
+            max_concurrency: Maximum async requests in flight to the LLM
+            max_retries: Retries when Ollama answers 429/502/503/504 (e.g. queue full)
         """
         self.base_url = base_url
         self.model = model
+        self.generate_endpoint = f"{base_url.rstrip('/')}/api/generate"
+        self.chat_endpoint = f"{base_url.rstrip('/')}/api/chat"
         self.temperature = temperature
+        self.keep_alive = keep_alive
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
         
-        logger.info(f"Initializing LLM client: {base_url}, model={model}")
+        logger.info("Initializing LLM client: {}, model={}", base_url, model)
         
-        self.llm = OllamaLLM(
-            base_url=base_url,
-            model=model,
-            temperature=temperature
-        )
+        self.llm = _shared_llm(base_url, model, temperature, keep_alive)
     
     def get_llm(self) -> BaseLLM:
         """Get the LangChain LLM instance"""
@@ -44,9 +82,185 @@ class LLMClient:
             Generated text response
         """
         try:
-            logger.debug(f"Invoking LLM with prompt length: {len(prompt)} chars")
+            logger.debug("Invoking LLM with prompt length: {} chars", len(prompt))
             response = self.llm.invoke(prompt)
-            logger.debug(f"LLM response length: {len(response)} chars")
+            logger.debug("LLM response length: {} chars", len(response))
+            return response
+        except Exception as e:
+            error_msg = f"LLM invocation failed: {str(e)}"
+            logger.error(error_msg)
+            return f"Error: {error_msg}"
+    
+    async def ainvoke(self, prompt: str) -> str:
+        """
+        Invoke the LLM asynchronously so independent calls can overlap
+        
+        The request goes to /api/generate on the shared AsyncClient and, like
+        astream, is retried when Ollama answers 429/502/503/504.
+        
+        Args:
+            prompt: The prompt text
+            
+        Returns:
+            Generated text response
+        """
+        try:
+            logger.debug("Invoking LLM (async) with prompt length: {} chars", len(prompt))
+            body = orjson.dumps({
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False,
+                "options": {"temperature": self.temperature},
+                "keep_alive": self.keep_alive
+            })
+            async with get_limiter("llm", self.max_concurrency):
+                http_response = await send_with_retry(
+                    "POST",
+                    self.generate_endpoint,
+                    max_retries=self.max_retries,
+                    content=body,
+                    headers=JSON_HEADERS,
+                    timeout=None
+                )
+            http_response.raise_for_status()
+            data = orjson.loads(http_response.content)
+            if data.get("error"):
+                raise RuntimeError(data["error"])
+            response = data.get("response", "")
+            logger.debug("LLM response length: {} chars", len(response))
+            return response
+        except Exception as e:
+            error_msg = f"LLM invocation failed: {str(e)}"
+            logger.error(error_msg)
+            return f"Error: {error_msg}"
+    
+    async def awarm(self) -> None:
+        """
+        Load the model into Ollama ahead of the first request
+        
+        A generate request without a prompt loads the model (for keep_alive)
+        without generating anything, and opens a keep-alive connection.
+        """
+        response = await get_async_client().post(
+            self.generate_endpoint,
+            content=orjson.dumps({"model": self.model, "keep_alive": self.keep_alive}),
+            headers=JSON_HEADERS,
+            timeout=None
+        )
+        response.raise_for_status()
+    
+    async def astream(
+        self,
+        prompt: str,
+        format: Optional[Union[str, Dict[str, Any]]] = None,
+        system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the LLM response from Ollama as it is generated
+        
+        With a system prompt the request goes to /api/chat as a separate
+        system message, so the identical prefix is served from Ollama's
+        prompt cache on later calls; otherwise /api/generate is used.
+        Closing the generator closes the HTTP response, which makes Ollama
+        stop generating.
+        
+        Args:
+            prompt: The prompt text
+            format: Optional Ollama output format, "json" or a JSON schema
+                the response must conform to
+            system: Optional system prompt shared across calls
+            
+        Yields:
+            Text chunks in generation order
+        """
+        logger.debug("Streaming LLM with prompt length: {} chars", len(prompt))
+        payload = {
+            "model": self.model,
+            "stream": True,
+            "options": {"temperature": self.temperature},
+            "keep_alive": self.keep_alive
+        }
+        if system is not None:
+            endpoint = self.chat_endpoint
+            payload["messages"] = [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ]
+        else:
+            endpoint = self.generate_endpoint
+            payload["prompt"] = prompt
+        if format is not None:
+            payload["format"] = format
+        body = orjson.dumps(payload)
+        
+        async with get_limiter("llm", self.max_concurrency):
+            for attempt in range(self.max_retries + 1):
+                async with get_async_client().stream(
+                    "POST",
+                    endpoint,
+                    content=body,
+                    headers=JSON_HEADERS,
+                    timeout=None
+                ) as response:
+                    if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                        delay = retry_delay(response, attempt)
+                    else:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            data = orjson.loads(line)
+                            if data.get("error"):
+                                raise RuntimeError(data["error"])
+                            text = data["message"].get("content") if "message" in data else data.get("response")
+                            if text:
+                                yield text
+                            if data.get("done"):
+                                break
+                        return
+                
+                logger.warning("LLM returned {}, retrying in {:.1f}s", response.status_code, delay)
+                await asyncio.sleep(delay)
+    
+    async def ainvoke_until(
+        self,
+        prompt: str,
+        is_complete: Callable[[str], bool],
+        format: Optional[Union[str, Dict[str, Any]]] = None,
+        system: Optional[str] = None,
+        on_progress: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Stream the LLM response and stop generating once it is complete
+        
+        is_complete is checked with the text so far whenever a chunk ends a
+        line or a JSON object; returning True closes the stream, which
+        cancels the rest of the generation on the Ollama side.
+        
+        Args:
+            prompt: The prompt text
+            is_complete: Predicate on the accumulated response
+            format: Optional Ollama output format (see astream)
+            system: Optional system prompt (see astream)
+            on_progress: Called with the text so far whenever a chunk ends a
+                line, a JSON value or a JSON object
+            
+        Returns:
+            Generated text response (possibly cut short)
+        """
+        chunks = []
+        try:
+            async with aclosing(self.astream(prompt, format, system)) as stream:
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    if on_progress is not None and (',' in chunk or '\n' in chunk or '}' in chunk):
+                        on_progress(''.join(chunks))
+                    if '\n' in chunk or '}' in chunk:
+                        if is_complete(''.join(chunks)):
+                            logger.debug("LLM response complete, stopping generation early")
+                            break
+            response = ''.join(chunks)
+            logger.debug("LLM response length: {} chars", len(response))
             return response
         except Exception as e:
             error_msg = f"LLM invocation failed: {str(e)}"
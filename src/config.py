@@ -11,24 +11,48 @@ class Settings(BaseSettings):
     # LLM Configuration
     llm_base_url: str = Field(default="http://localhost:11434", description="Ollama or LLM API base URL")
     llm_model: str = Field(default="llama3.2", description="LLM model name")
+    llm_keep_alive: str = Field(default="30m", description="How long Ollama keeps the model and prompt cache loaded")
+    llm_max_concurrency: int = Field(default=16, description="Maximum concurrent requests to the LLM")
     
     # BERT Anomaly Detection
     bert_api_url: str = Field(default="http://localhost:7000", description="BERT API endpoint")
+    bert_batch_size: int = Field(default=32, description="Maximum logs per BERT batch request")
+    bert_batch_wait_ms: float = Field(default=5.0, description="Time concurrent BERT requests wait to be batched together (0 disables)")
+    bert_max_concurrency: int = Field(default=16, description="Maximum concurrent requests to the BERT API")
+    bert_gzip_requests: bool = Field(default=False, description="Gzip BERT request bodies over 1 KB (the BERT API must accept Content-Encoding: gzip)")
     
     # Search API Configuration
     search_provider: str = Field(default="duckduckgo", description="Search provider: 'duckduckgo' (free) or 'brave'")
     brave_api_key: str = Field(default="", description="Brave Search API key (only needed if search_provider='brave')")
+    search_max_concurrency: int = Field(default=4, description="Maximum concurrent threat intelligence searches")
+    search_refine_wait_ms: float = Field(default=1000.0, description="Time to wait for the LLM keyword search before using the speculative regex keyword search")
+    search_cache_size: int = Field(default=512, description="Search responses kept for repeated queries (0 disables)")
+    search_cache_ttl: float = Field(default=3600.0, description="Seconds a cached search response is reused (0 disables)")
+    search_rate_limit: float = Field(default=2.0, description="DuckDuckGo searches per second on average (0 disables pacing)")
+    search_rate_burst: int = Field(default=5, description="DuckDuckGo searches allowed back to back before pacing starts")
+    ddg_region: str = Field(default="us-en", description="DuckDuckGo search region, e.g. 'us-en' or 'wt-wt' (no region)")
+    ddg_safesearch: str = Field(default="off", description="DuckDuckGo safe search: 'on', 'moderate' or 'off'")
+    ddg_timelimit: str = Field(default="", description="Only return DuckDuckGo results from the last 'd', 'w', 'm' or 'y' (empty for any time)")
     
     # Application Settings
     log_level: str = Field(default="INFO", description="Logging level")
+    http_max_retries: int = Field(default=3, description="Retries for throttled or unavailable (429/502/503/504) outbound requests")
     max_log_length: int = Field(default=10000, description="Maximum log text length")
     
     # Server Configuration
     api_host: str = Field(default="0.0.0.0", description="API server host")
     api_port: int = Field(default=8080, description="API server port")
+    api_warmup: bool = Field(default=True, description="Load the BERT and LLM models before the API server accepts requests")
+    api_workers: int = Field(default=1, description="API server worker processes (caches and the raw text store are per process)")
     
     # Analysis Configuration
     bert_anomaly_threshold: float = Field(default=10.5, description="BERT anomaly threshold")
+    enable_bert_shortcut: bool = Field(default=False, description="Skip the LLM for logs BERT scores far from the threshold")
+    bert_shortcut_normal_ratio: float = Field(default=0.3, description="Scores below this fraction of the threshold are reported as normal without the LLM")
+    bert_shortcut_anomaly_ratio: float = Field(default=1.5, description="Scores above this multiple of the threshold are reported as anomalous without the LLM")
+    cache_size: int = Field(default=4096, description="Entries kept in the BERT result and keyword caches")
+    result_cache_size: int = Field(default=8192, description="Full analysis results and raw LLM outputs kept for duplicate logs and raw text lookups (0 disables)")
+    template_cache_size: int = Field(default=0, description="Analyses reused for logs differing only in timestamps, IPs, ports and hex ids (0 disables)")
     
     class Config:
         env_file = ".env"
@@ -1,5 +1,9 @@
 # LangChain Tool for BERT Anomaly Detection
-from typing import Type, Optional
+import asyncio
+import bisect
+import functools
+import threading
+from typing import Type, Optional, Tuple, List
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from loguru import logger
@@ -8,6 +12,49 @@ from ..clients.bert_client import BertClient
 from ..config import settings
 
 
+# Score interpretations, from lowest to highest band
+_INTERPRETATIONS = (
+    "NORMAL - Log appears benign with typical patterns",
+    "SUSPICIOUS - Log shows minor deviations from normal",
+    "CONCERNING - Log exhibits unusual patterns",
+    "ANOMALOUS - Log shows significant abnormal behavior"
+)
+
+
+@functools.lru_cache(maxsize=16)
+def _cutoffs(threshold: float) -> Tuple[float, float, float]:
+    """Score boundaries between the interpretation bands for a threshold"""
+    return (threshold * 0.3, threshold * 0.7, threshold)
+
+
+# One client for the whole process so every tool instance shares its result
+# cache, batch queue and connection pool
+_shared_client: Optional[BertClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_bert_client() -> BertClient:
+    """
+    Get the process-wide BERT client configured from settings
+    
+    Returns:
+        Shared BertClient
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = BertClient(
+                settings.bert_api_url,
+                cache_size=settings.cache_size,
+                batch_size=settings.bert_batch_size,
+                batch_wait=settings.bert_batch_wait_ms / 1000,
+                max_concurrency=settings.bert_max_concurrency,
+                max_retries=settings.http_max_retries,
+                gzip_requests=settings.bert_gzip_requests
+            )
+        return _shared_client
+
+
 class BertAnomalyInput(BaseModel):
     """Input schema for BERT anomaly detection tool"""
     log_text: str = Field(description="The log text to analyze for anomalies")
@@ -36,15 +83,19 @@ class BertAnomalyTool(BaseTool):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if self.bert_client is None:
-            self.bert_client = BertClient(settings.bert_api_url)
+            self.bert_client = get_shared_bert_client()
     
-    def get_detection_data(self, log_text: str) -> dict:
-        """Get raw detection data for API response"""
-        if len(log_text) > settings.max_log_length:
-            log_text = log_text[:settings.max_log_length]
-        
-        result = self.bert_client.detect_anomaly(log_text)
-        
+    @staticmethod
+    def _prepare(log_text: str) -> str:
+        """Cut a log down to the maximum length sent to the BERT API"""
+        max_length = settings.max_log_length
+        if len(log_text) > max_length:
+            logger.warning("Log truncated to {} characters", max_length)
+            return log_text[:max_length]
+        return log_text
+    
+    def _detection_data(self, result: dict) -> Optional[dict]:
+        """Convert a BertClient result into the raw detection data for API response"""
         if result.get("error"):
             return None
         
@@ -59,26 +110,8 @@ class BertAnomalyTool(BaseTool):
             "confidence": confidence
         }
     
-    def _run(self, log_text: str) -> str:
-        """
-        Execute BERT anomaly detection
-        
-        Args:
-            log_text: The log text to analyze
-            
-        Returns:
-            JSON string with detection results
-        """
-        logger.info("BERT Anomaly Tool: Analyzing log")
-        
-        # Truncate if too long
-        if len(log_text) > settings.max_log_length:
-            log_text = log_text[:settings.max_log_length]
-            logger.warning(f"Log truncated to {settings.max_log_length} characters")
-        
-        result = self.bert_client.detect_anomaly(log_text)
-        
-        # Format result as structured text for LLM
+    def _format_result(self, result: dict) -> str:
+        """Format a BertClient result as structured text for the LLM"""
         if result.get("error"):
             return f"""
 BERT Anomaly Detection ERROR: {result['error']}
@@ -93,14 +126,7 @@ Unable to perform anomaly detection. Proceeding with manual analysis.
         confidence = min(100.0, (anomaly_score / threshold) * 100)
         
         # Interpret the score
-        if anomaly_score < threshold * 0.3:
-            interpretation = "NORMAL - Log appears benign with typical patterns"
-        elif anomaly_score < threshold * 0.7:
-            interpretation = "SUSPICIOUS - Log shows minor deviations from normal"
-        elif anomaly_score < threshold:
-            interpretation = "CONCERNING - Log exhibits unusual patterns"
-        else:
-            interpretation = "ANOMALOUS - Log shows significant abnormal behavior"
+        interpretation = _INTERPRETATIONS[bisect.bisect_right(_cutoffs(threshold), anomaly_score)]
         
         return f"""
 BERT Anomaly Detection Results:
@@ -113,9 +139,81 @@ Interpretation: {interpretation}
 Analysis: {'This log exhibits anomalous behavior and requires deeper investigation.' if is_anomaly else 'This log appears normal but should still be analyzed for context.'}
 """
     
+    def detect(self, log_text: str) -> Tuple[str, Optional[dict]]:
+        """
+        Run BERT anomaly detection with a single request
+        
+        Args:
+            log_text: The log text to analyze
+            
+        Returns:
+            Tuple of (formatted results for the LLM, raw detection data for API response)
+        """
+        logger.info("BERT Anomaly Tool: Analyzing log")
+        
+        result = self.bert_client.detect_anomaly(self._prepare(log_text))
+        return self._format_result(result), self._detection_data(result)
+    
+    async def adetect(self, log_text: str) -> Tuple[str, Optional[dict]]:
+        """
+        Run BERT anomaly detection without blocking the event loop
+        
+        Concurrent calls are coalesced into batch requests by the client.
+        
+        Args:
+            log_text: The log text to analyze
+            
+        Returns:
+            Tuple of (formatted results for the LLM, raw detection data for API response)
+        """
+        logger.info("BERT Anomaly Tool: Analyzing log (async)")
+        
+        result = await self.bert_client.detect_anomaly_async(self._prepare(log_text))
+        return self._format_result(result), self._detection_data(result)
+    
+    async def adetect_batch(self, log_texts: List[str]) -> List[Tuple[str, Optional[dict]]]:
+        """
+        Run BERT anomaly detection for many logs through the batch endpoint
+        
+        Args:
+            log_texts: The log texts to analyze
+            
+        Returns:
+            List of (formatted results, raw detection data) in input order
+        """
+        logger.info("BERT Anomaly Tool: Analyzing batch of {} logs", len(log_texts))
+        
+        log_texts = [self._prepare(log_text) for log_text in log_texts]
+        batch_size = settings.bert_batch_size
+        
+        chunks = await asyncio.gather(*(
+            self.bert_client.detect_anomaly_batch_async(log_texts[i:i + batch_size])
+            for i in range(0, len(log_texts), batch_size)
+        ))
+        
+        return [
+            (self._format_result(result), self._detection_data(result))
+            for chunk in chunks
+            for result in chunk
+        ]
+    
+    def _run(self, log_text: str) -> str:
+        """
+        Execute BERT anomaly detection
+        
+        Args:
+            log_text: The log text to analyze
+            
+        Returns:
+            JSON string with detection results
+        """
+        text_summary, _ = self.detect(log_text)
+        return text_summary
+    
     async def _arun(self, log_text: str) -> str:
-        """Async version (not implemented, falls back to sync)"""
-        return self._run(log_text)
+        """Async version; concurrent calls share batched BERT requests"""
+        text_summary, _ = await self.adetect(log_text)
+        return text_summary
 
 
 # Example usage
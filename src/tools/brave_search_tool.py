@@ -1,13 +1,38 @@
 # LangChain Tool for Brave Search API
-from typing import Type, Optional, List, Dict, Any
+import threading
+from typing import Type, Optional, List, Dict, Any, Tuple
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 import requests
+import httpx
+import orjson
+from cachetools import TTLCache
 from loguru import logger
 
+from ..clients.http_client import get_limiter, get_session, send_with_retry
 from ..config import settings
 
 
+_MISSING_KEY_MESSAGE = """
+Brave Search API Error: API key not configured.
+Please set BRAVE_API_KEY in your .env file.
+
+To get an API key:
+1. Visit https://brave.com/search/api/
+2. Sign up for an API key
+3. Add it to your .env file: BRAVE_API_KEY=your_key_here
+"""
+
+# Brave responses by normalized query; agents tend to look up the same CVE
+# or IoC repeatedly, and the free tier is heavily rate limited. Sync searches
+# run in worker threads, hence the lock
+_response_cache: TTLCache = TTLCache(
+    maxsize=max(settings.search_cache_size, 1),
+    ttl=max(settings.search_cache_ttl, 0.001)
+)
+_response_cache_lock = threading.Lock()
+
+
 class BraveSearchInput(BaseModel):
     """Input schema for Brave Search tool"""
     query: str = Field(description="The search query for cybersecurity threat intelligence")
@@ -47,117 +72,153 @@ class BraveSearchTool(BaseTool):
         if not self.api_key:
             self.api_key = settings.brave_api_key
     
-    def get_search_results(self, query: str) -> List[dict]:
+    def get_search_results(self, query: str, no_cache: bool = False) -> List[dict]:
         """Get raw search results for API response"""
-        logger.info(f"Brave Search: Fetching results for '{query}'")
+        logger.info("Brave Search: Fetching results for '{}'", query)
         
         if not self.api_key or self.api_key == "your_brave_api_key_here":
             return []
         
         try:
-            headers = {
-                "Accept": "application/json",
-                "X-Subscription-Token": self.api_key
-            }
-            params = {"q": query, "count": 5}
-            
-            response = requests.get(self.base_url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            results = data.get("web", {}).get("results", [])
-            
-            return [
-                {
-                    "title": r.get("title", "No title"),
-                    "url": r.get("url", ""),
-                    "snippet": r.get("description", "No description")
-                }
-                for r in results[:5]
-            ]
+            return self._sources(self._fetch(query, no_cache))
         except Exception as e:
-            logger.error(f"Error fetching Brave search results: {e}")
+            logger.error("Error fetching Brave search results: {}", e)
             return []
     
-    def _run(self, query: str) -> str:
+    async def aget_search_results(self, query: str, no_cache: bool = False) -> List[dict]:
+        """Async version of get_search_results using the shared keep-alive client"""
+        logger.info("Brave Search: Fetching results for '{}'", query)
+        
+        if not self.api_key or self.api_key == "your_brave_api_key_here":
+            return []
+        
+        try:
+            return self._sources(await self._afetch(query, no_cache))
+        except Exception as e:
+            logger.error("Error fetching Brave search results: {}", e)
+            return []
+    
+    async def asearch(self, query: str, no_cache: bool = False) -> Tuple[str, List[dict]]:
         """
-        Execute Brave Search for threat intelligence
+        Search once and return both the formatted results and the sources
         
         Args:
             query: Search query
+            no_cache: Query Brave even if a recent response for the query is cached
             
         Returns:
-            Formatted search results
+            Tuple of (formatted results for the LLM, search sources for API response)
         """
-        logger.info(f"Brave Search Tool: Searching for '{query}'")
+        logger.info("Brave Search Tool: Searching for '{}'", query)
         
         if not self.api_key or self.api_key == "your_brave_api_key_here":
             logger.warning("Brave API key not configured")
-            return """
-Brave Search API Error: API key not configured.
-Please set BRAVE_API_KEY in your .env file.
-
-To get an API key:
-1. Visit https://brave.com/search/api/
-2. Sign up for an API key
-3. Add it to your .env file: BRAVE_API_KEY=your_key_here
-"""
+            return _MISSING_KEY_MESSAGE, []
         
         try:
-            headers = {
-                "Accept": "application/json",
-                "Accept-Encoding": "gzip",
-                "X-Subscription-Token": self.api_key
-            }
-            
-            params = {
-                "q": query,
-                "count": 5,  # Number of results
-                "safesearch": "off",
-                "text_decorations": False,
-                "search_lang": "en"
-            }
-            
-            response = requests.get(
+            data = await self._afetch(query, no_cache)
+        except httpx.HTTPError as e:
+            error_msg = f"Brave Search API error: {str(e)}"
+            logger.error(error_msg)
+            return f"Error retrieving threat intelligence: {error_msg}", []
+        except Exception as e:
+            error_msg = f"Unexpected error during search: {str(e)}"
+            logger.error(error_msg)
+            return f"Error: {error_msg}", []
+        
+        return self._format_results(query, data), self._sources(data)
+    
+    def _fetch(self, query: str, no_cache: bool = False) -> Dict[str, Any]:
+        """Send one search request with the shared session and decode the response"""
+        if not no_cache:
+            cached = self._cached_response(query)
+            if cached is not None:
+                return cached
+        
+        response = get_session().get(
+            self.base_url,
+            headers=self._headers(),
+            params=self._params(query),
+            timeout=10
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        self._store_response(query, data)
+        return data
+    
+    async def _afetch(self, query: str, no_cache: bool = False) -> Dict[str, Any]:
+        """Send one search request with the shared keep-alive client and decode the response"""
+        if not no_cache:
+            cached = self._cached_response(query)
+            if cached is not None:
+                return cached
+        
+        async with get_limiter("search", settings.search_max_concurrency):
+            response = await send_with_retry(
+                "GET",
                 self.base_url,
-                headers=headers,
-                params=params,
+                max_retries=settings.http_max_retries,
+                headers=self._headers(),
+                params=self._params(query),
                 timeout=10
             )
-            response.raise_for_status()
-            
-            data = response.json()
-            results = data.get("web", {}).get("results", [])
-            
-            if not results:
-                return f"No threat intelligence found for query: {query}"
-            
-            # Format results for LLM consumption
-            formatted_results = f"""
-Brave Search Threat Intelligence Results for: "{query}"
-{'='*70}
-
-Found {len(results)} relevant sources:
-
-"""
-            for i, result in enumerate(results[:5], 1):
-                title = result.get("title", "No title")
-                url = result.get("url", "")
-                description = result.get("description", "No description available")
-                
-                formatted_results += f"""
-[{i}] {title}
-    URL: {url}
-    Summary: {description}
-
-"""
-            
-            formatted_results += f"""
-{'='*70}
-Use this threat intelligence to enhance your analysis of the log.
-"""
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        self._store_response(query, data)
+        return data
+    
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        """Normalize case and whitespace so equivalent queries share a cache entry"""
+        return " ".join(query.lower().split())
+    
+    def _cached_response(self, query: str) -> Optional[Dict[str, Any]]:
+        """Return the cached Brave response for query, if still fresh"""
+        if settings.search_cache_size <= 0 or settings.search_cache_ttl <= 0:
+            return None
+        with _response_cache_lock:
+            data = _response_cache.get(self._cache_key(query))
+        if data is not None:
+            logger.debug("Brave Search: Serving '{}' from cache", query)
+        return data
+    
+    def _store_response(self, query: str, data: Dict[str, Any]) -> None:
+        """Cache a successful Brave response"""
+        if settings.search_cache_size > 0 and settings.search_cache_ttl > 0:
+            with _response_cache_lock:
+                _response_cache[self._cache_key(query)] = data
+    
+    @staticmethod
+    def _sources(data: Dict[str, Any]) -> List[dict]:
+        """Convert a Brave API response into search sources for the API response"""
+        results = data.get("web", {}).get("results", [])
+        return [
+            {
+                "title": r.get("title", "No title"),
+                "url": r.get("url", ""),
+                "snippet": r.get("description", "No description")
+            }
+            for r in results[:5]
+        ]
+    
+    def _run(self, query: str) -> str:
+        """
+        Execute Brave Search for threat intelligence
+        
+        Args:
+            query: Search query
             
-            logger.info(f"Brave Search: Found {len(results)} results")
-            return formatted_results
+        Returns:
+            Formatted search results
+        """
+        logger.info("Brave Search Tool: Searching for '{}'", query)
+        
+        if not self.api_key or self.api_key == "your_brave_api_key_here":
+            logger.warning("Brave API key not configured")
+            return _MISSING_KEY_MESSAGE
+        
+        try:
+            return self._format_results(query, self._fetch(query))
             
         except requests.exceptions.RequestException as e:
             error_msg = f"Brave Search API error: {str(e)}"
@@ -170,8 +231,76 @@ Use this threat intelligence to enhance your analysis of the log.
             return f"Error: {error_msg}"
     
     async def _arun(self, query: str) -> str:
-        """Async version (not implemented, falls back to sync)"""
-        return self._run(query)
+        """Async version using the shared keep-alive client"""
+        logger.info("Brave Search Tool: Searching for '{}'", query)
+        
+        if not self.api_key or self.api_key == "your_brave_api_key_here":
+            logger.warning("Brave API key not configured")
+            return _MISSING_KEY_MESSAGE
+        
+        try:
+            return self._format_results(query, await self._afetch(query))
+            
+        except httpx.HTTPError as e:
+            error_msg = f"Brave Search API error: {str(e)}"
+            logger.error(error_msg)
+            return f"Error retrieving threat intelligence: {error_msg}"
+        
+        except Exception as e:
+            error_msg = f"Unexpected error during search: {str(e)}"
+            logger.error(error_msg)
+            return f"Error: {error_msg}"
+    
+    def _headers(self) -> Dict[str, str]:
+        """Request headers for the threat intelligence search"""
+        return {
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip",
+            "X-Subscription-Token": self.api_key
+        }
+    
+    @staticmethod
+    def _params(query: str) -> Dict[str, Any]:
+        """Query parameters for the threat intelligence search"""
+        return {
+            "q": query,
+            "count": 5,  # Number of results
+            "safesearch": "off",
+            "text_decorations": False,
+            "search_lang": "en"
+        }
+    
+    @staticmethod
+    def _format_results(query: str, data: Dict[str, Any]) -> str:
+        """Format a Brave API response for LLM consumption"""
+        results = data.get("web", {}).get("results", [])
+        
+        if not results:
+            return f"No threat intelligence found for query: {query}"
+        
+        parts = [f"""
+Brave Search Threat Intelligence Results for: "{query}"
+{'='*70}
+
+Found {len(results)} relevant sources:
+
+"""]
+        parts.extend(
+            f"""
+[{i}] {result.get("title", "No title")}
+    URL: {result.get("url", "")}
+    Summary: {result.get("description", "No description available")}
+
+"""
+            for i, result in enumerate(results[:5], 1)
+        )
+        parts.append(f"""
+{'='*70}
+Use this threat intelligence to enhance your analysis of the log.
+""")
+        
+        logger.info("Brave Search: Found {} results", len(results))
+        return "".join(parts)
 
 
 # Example usage
@@ -1,15 +1,154 @@
 # LangChain Tool for DuckDuckGo Search (Free Alternative)
-from typing import Type, Optional, List
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Type, Optional, List, Tuple
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from ddgs import DDGS
-from urllib.parse import quote
+from cachetools import TTLCache
 from loguru import logger
 
+from ..clients.http_client import TokenBucket, get_limiter
+from ..config import settings
+
+
+# DDGS caches its search engine instances, and with them their HTTP
+# connection pools, so one instance is kept for the whole process
+_ddgs: Optional[DDGS] = None
+_ddgs_lock = threading.Lock()
+
+
+def _get_ddgs() -> DDGS:
+    """Get the process-wide DDGS client, creating it on first use"""
+    global _ddgs
+    with _ddgs_lock:
+        if _ddgs is None:
+            _ddgs = DDGS()
+        return _ddgs
+
+
+# DuckDuckGo answers bursts with throttling that costs far more than a short
+# wait, so searches that miss the cache are paced
+_rate_limiter: Optional[TokenBucket] = (
+    TokenBucket(settings.search_rate_limit, settings.search_rate_burst)
+    if settings.search_rate_limit > 0 else None
+)
+
+
+# Search results by normalized query; DuckDuckGo throttles bursts of
+# repeated queries, and searches run in worker threads, hence the lock
+_results_cache: TTLCache = TTLCache(
+    maxsize=max(settings.search_cache_size, 1),
+    ttl=max(settings.search_cache_ttl, 0.001)
+)
+_results_cache_lock = threading.Lock()
+
+
+def _cache_enabled() -> bool:
+    """Whether search results are cached at all"""
+    return settings.search_cache_size > 0 and settings.search_cache_ttl > 0
+
+
+def _cache_key(query: str, max_results: int) -> Tuple[str, int]:
+    """Normalize case and whitespace so equivalent queries share a cache entry"""
+    return " ".join(query.lower().split()), max_results
+
+
+def _cached_results(query: str, max_results: int) -> Optional[List[dict]]:
+    """Return a copy of the cached results for query, if still fresh"""
+    if not _cache_enabled():
+        return None
+    with _results_cache_lock:
+        results = _results_cache.get(_cache_key(query, max_results))
+    if results is None:
+        return None
+    logger.debug("DuckDuckGo: Serving '{}' from cache", query)
+    return list(results)
+
+
+def _store_results(query: str, max_results: int, results: List[dict]) -> None:
+    """Cache non-empty search results"""
+    if results and _cache_enabled():
+        with _results_cache_lock:
+            _results_cache[_cache_key(query, max_results)] = list(results)
+
+
+# Results per search unless the caller asks for fewer (or more, up to the limit)
+DEFAULT_MAX_RESULTS = 5
+MAX_RESULTS_LIMIT = 10
+
+# DuckDuckGo's query parser degrades on very long input
+MAX_QUERY_LENGTH = 500
+
+# Returned to the LLM instead of searching for a blank query
+_NO_QUERY_MESSAGE = "No query provided"
+
+
+def _clean_query(query: str) -> str:
+    """Strip a query and truncate it to MAX_QUERY_LENGTH; empty if there is nothing to search"""
+    query = (query or "").strip()
+    if len(query) > MAX_QUERY_LENGTH:
+        logger.warning("DuckDuckGo: Truncating {}-character query to {}", len(query), MAX_QUERY_LENGTH)
+        query = query[:MAX_QUERY_LENGTH]
+    return query
+
+
+# Fixed parts of the formatted results, built once at import
+_SEP = "=" * 70
+_HEADER_TEMPLATE = f"""
+DuckDuckGo Threat Intelligence Results for: "{{query}}"
+{_SEP}
+
+Found {{count}} relevant sources:
+
+"""
+_HIT_TEMPLATE = """
+[{index}] {title}
+    URL: {url}
+    Summary: {summary}
+
+"""
+_FOOTER = f"""
+{_SEP}
+Use this threat intelligence to enhance your analysis of the log.
+"""
+
+
+@functools.lru_cache(maxsize=128)
+def _render_results(query: str, hits: Tuple[Tuple[str, str, str], ...]) -> str:
+    """
+    Render search hits for LLM consumption
+    
+    Cached results come back identical for repeated queries, so their
+    rendering is cached too.
+    
+    Args:
+        query: Search query
+        hits: (title, url, summary) of each result
+        
+    Returns:
+        Formatted search results
+    """
+    parts = [_HEADER_TEMPLATE.format(query=query, count=len(hits))]
+    parts.extend(
+        _HIT_TEMPLATE.format(index=i, title=title, url=url, summary=summary)
+        for i, (title, url, summary) in enumerate(hits, 1)
+    )
+    parts.append(_FOOTER)
+    return "".join(parts)
+
 
 class DuckDuckGoSearchInput(BaseModel):
     """Input schema for DuckDuckGo Search tool"""
     query: str = Field(description="The search query for cybersecurity threat intelligence")
+    max_results: int = Field(
+        default=DEFAULT_MAX_RESULTS,
+        ge=1,
+        le=MAX_RESULTS_LIMIT,
+        description="Number of results to return; use fewer for simple lookups"
+    )
 
 
 class DuckDuckGoSearchTool(BaseTool):
@@ -28,7 +167,9 @@ class DuckDuckGoSearchTool(BaseTool):
     - Research malware families and techniques
     - Get latest security advisories and patches
     
-    Input: query (string) - Search query related to the threat or log content
+    Input: query (string) - Search query related to the threat or log content.
+    For fewer or more results, send a JSON object instead, e.g.
+    {"query": "CVE-2024-1234", "max_results": 1} (1-10, default: 5)
     
     Returns: Formatted search results with titles, URLs, and descriptions from 
     trusted security sources.
@@ -40,74 +181,170 @@ class DuckDuckGoSearchTool(BaseTool):
     """
     args_schema: Type[BaseModel] = DuckDuckGoSearchInput
     
-    def get_search_results(self, query: str) -> List[dict]:
+    def get_search_results(self, query: str, no_cache: bool = False) -> List[dict]:
         """Get raw search results for API response"""
-        logger.info(f"DuckDuckGo: Fetching results for '{query}'")
+        query = _clean_query(query)
+        if not query:
+            return []
+        
+        logger.info("DuckDuckGo: Fetching results for '{}'", query)
         
         try:
-            with DDGS() as ddgs:
-                search_results = list(ddgs.text(query, max_results=5))
-            
-            results = []
-            for r in search_results:
-                results.append({
-                    "title": r.get("title", "No title"),
-                    "url": r.get("href", ""),
-                    "snippet": r.get("body", "No description available")
-                })
+            results = self._sources(self._text_search(query, no_cache))
             
             if not results:
-                logger.warning(f"No results found for: {query}")
+                logger.warning("No results found for: {}", query)
             
             return results
         except Exception as e:
-            logger.error(f"Error fetching search results: {e}")
+            logger.error("Error fetching search results: {}", e)
+            return []
+    
+    def get_search_results_many(self, queries: List[str]) -> List[List[dict]]:
+        """
+        Get raw search results for several queries at once
+        
+        Distinct queries are searched concurrently in worker threads, at most
+        SEARCH_MAX_CONCURRENCY at a time; repeated queries are searched once.
+        
+        Args:
+            queries: Search queries
+            
+        Returns:
+            Search results for each query, in input order
+        """
+        unique = list(dict.fromkeys(queries))
+        if not unique:
             return []
+        
+        with ThreadPoolExecutor(max_workers=min(len(unique), max(settings.search_max_concurrency, 1))) as executor:
+            results = dict(zip(unique, executor.map(self.get_search_results, unique)))
+        return [list(results[query]) for query in queries]
     
-    def _run(self, query: str) -> str:
+    def _run(self, query: str, max_results: int = DEFAULT_MAX_RESULTS) -> str:
         """
         Execute DuckDuckGo Search for threat intelligence
         
         Args:
             query: Search query
+            max_results: Number of results to return
             
         Returns:
             Formatted search results
         """
-        logger.info(f"DuckDuckGo Search Tool: Searching for '{query}'")
+        query = _clean_query(query)
+        if not query:
+            return _NO_QUERY_MESSAGE
+        
+        logger.info("DuckDuckGo Search Tool: Searching for '{}'", query)
         
         try:
-            with DDGS() as ddgs:
-                search_results = list(ddgs.text(query, max_results=5))
-            
-            if not search_results:
-                return f"No specific threat intelligence found for query: {query}"
-            
-            # Format results for LLM consumption
-            formatted_results = f"""
-DuckDuckGo Threat Intelligence Results for: "{query}"
-{'='*70}
-
-Found {len(search_results)} relevant sources:
-
-"""
-            for i, result in enumerate(search_results, 1):
-                formatted_results += f"""
-[{i}] {result.get('title', 'No title')}
-    URL: {result.get('href', '')}
-    Summary: {result.get('body', 'No description')[:300]}
-
-"""
-            
-            formatted_results += f"""
-{'='*70}
-Use this threat intelligence to enhance your analysis of the log.
-"""
-            
-            logger.info(f"DuckDuckGo Search: Found {len(search_results)} results")
-            return formatted_results
-            
+            return self._format_results(query, self._text_search(query, max_results=max_results))
         except Exception as e:
-            error_msg = f"DuckDuckGo search error: {str(e)}"
-            logger.error(error_msg)
-            return f"Error retrieving threat intelligence: {error_msg}. Proceeding with available information."
\ No newline at end of file
+            return self._error_text(e)
+    
+    async def asearch(self, query: str, no_cache: bool = False) -> Tuple[str, List[dict]]:
+        """
+        Search once and return both the formatted results and the sources
+        
+        ddgs is blocking, so the search runs in a worker thread.
+        
+        Args:
+            query: Search query
+            no_cache: Search even if recent results for the query are cached
+            
+        Returns:
+            Tuple of (formatted results for the LLM, search sources for API response)
+        """
+        query = _clean_query(query)
+        if not query:
+            return _NO_QUERY_MESSAGE, []
+        
+        logger.info("DuckDuckGo Search Tool: Searching for '{}'", query)
+        
+        search_results = None if no_cache else _cached_results(query, DEFAULT_MAX_RESULTS)
+        if search_results is None:
+            try:
+                async with get_limiter("search", settings.search_max_concurrency):
+                    search_results = await asyncio.to_thread(self._text_search, query, True)
+            except Exception as e:
+                return self._error_text(e), []
+        
+        return self._format_results(query, search_results), self._sources(search_results)
+    
+    async def aget_search_results(self, query: str, no_cache: bool = False) -> List[dict]:
+        """Async version of get_search_results; ddgs is blocking, so it runs in a worker thread"""
+        async with get_limiter("search", settings.search_max_concurrency):
+            return await asyncio.to_thread(self.get_search_results, query, no_cache)
+    
+    async def aget_search_results_many(self, queries: List[str]) -> List[List[dict]]:
+        """Async version of get_search_results_many, sharing the async search limiter"""
+        unique = list(dict.fromkeys(queries))
+        results = dict(zip(unique, await asyncio.gather(*(self.aget_search_results(query) for query in unique))))
+        return [list(results[query]) for query in queries]
+    
+    async def _arun(self, query: str, max_results: int = DEFAULT_MAX_RESULTS) -> str:
+        """Async version of _run; ddgs is blocking, so it runs in a worker thread"""
+        async with get_limiter("search", settings.search_max_concurrency):
+            return await asyncio.to_thread(self._run, query, max_results)
+    
+    @staticmethod
+    def _text_search(query: str, no_cache: bool = False, max_results: int = DEFAULT_MAX_RESULTS) -> List[dict]:
+        """Run the DuckDuckGo text search, serving recent repeats from the cache"""
+        max_results = min(max(max_results, 1), MAX_RESULTS_LIMIT)
+        if not no_cache:
+            cached = _cached_results(query, max_results)
+            if cached is not None:
+                return cached
+        
+        if _rate_limiter is not None:
+            waited = _rate_limiter.acquire()
+            if waited:
+                logger.debug("DuckDuckGo: Paced search by {:.2f}s", waited)
+        
+        results = list(_get_ddgs().text(
+            query,
+            region=settings.ddg_region,
+            safesearch=settings.ddg_safesearch,
+            timelimit=settings.ddg_timelimit or None,
+            max_results=max_results
+        ))
+        _store_results(query, max_results, results)
+        return results
+    
+    @staticmethod
+    def _sources(search_results: List[dict]) -> List[dict]:
+        """Convert DuckDuckGo results into search sources for the API response"""
+        return [
+            {
+                "title": r.get("title", "No title"),
+                "url": r.get("href", ""),
+                "snippet": r.get("body", "No description available")
+            }
+            for r in search_results
+        ]
+    
+    @staticmethod
+    def _format_results(query: str, search_results: List[dict]) -> str:
+        """Format DuckDuckGo results for LLM consumption"""
+        if not search_results:
+            return f"No specific threat intelligence found for query: {query}"
+        
+        hits = tuple(
+            (
+                result.get("title", "No title"),
+                result.get("href", ""),
+                result.get("body", "No description")[:300]
+            )
+            for result in search_results
+        )
+        
+        logger.info("DuckDuckGo Search: Found {} results", len(search_results))
+        return _render_results(query, hits)
+    
+    @staticmethod
+    def _error_text(error: Exception) -> str:
+        """Describe a failed search to the LLM"""
+        error_msg = f"DuckDuckGo search error: {str(error)}"
+        logger.error(error_msg)
+        return f"Error retrieving threat intelligence: {error_msg}. Proceeding with available information."
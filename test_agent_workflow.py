@@ -5,19 +5,15 @@ Test script for the enhanced CyberSec Agent with LangChain agent at the end
 
 import sys
 import os
+import argparse
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.agent.cybersec_agent import CyberSecAgent
 
-def test_agent():
-    print("="*70)
-    print("Testing Enhanced CyberSec Agent with LangChain ReAct Agent")
-    print("="*70)
-    
-    # Test log
-    test_log = """
+# Test log
+TEST_LOG = """
     2024-01-30 14:23:45 CRITICAL: Multiple failed SSH login attempts detected
     2024-01-30 14:23:46 Failed password for admin from 203.0.113.42 port 55892 ssh2
     2024-01-30 14:23:47 Failed password for admin from 203.0.113.42 port 55893 ssh2
@@ -26,6 +22,14 @@ def test_agent():
     2024-01-30 14:23:50 Failed password for root from 203.0.113.42 port 55896 ssh2
     2024-01-30 14:23:51 WARNING: Potential brute force attack from 203.0.113.42
     """
+
+
+def test_agent():
+    print("="*70)
+    print("Testing Enhanced CyberSec Agent with LangChain ReAct Agent")
+    print("="*70)
+    
+    test_log = TEST_LOG
     
     print(f"\nTest Log:\n{test_log}\n")
     
@@ -38,57 +42,89 @@ def test_agent():
     print("Starting Analysis")
     print("="*70)
     
-    result = agent.analyze_log(test_log, use_brave_search=True)
+    result = agent.analyze_log_sync(test_log, use_brave_search=True)
     
-    # Display results
-    print("\n" + "="*70)
-    print("ANALYSIS RESULTS")
-    print("="*70)
+    # Display results, collected and written in one go
+    sep = "=" * 70
+    lines = ["", sep, "ANALYSIS RESULTS", sep]
     
-    print(f"\n🎯 Threat Type: {result['threat_type']}")
-    print(f"⚠️  Severity: {result['severity']}")
-    print(f"📊 Confidence: {result['confidence_score']:.2f}")
+    lines.append(f"\n🎯 Threat Type: {result['threat_type']}")
+    lines.append(f"⚠️  Severity: {result['severity']}")
+    lines.append(f"📊 Confidence: {result['confidence_score']:.2f}")
     
     if result.get('bert_data'):
-        print(f"\n🤖 BERT Detection:")
-        print(f"   Anomaly Score: {result['bert_data']['anomaly_score']:.3f}")
-        print(f"   Is Anomaly: {result['bert_data']['is_anomaly']}")
-        print(f"   Confidence: {result['bert_data']['confidence']:.1f}%")
+        lines.append(f"\n🤖 BERT Detection:")
+        lines.append(f"   Anomaly Score: {result['bert_data']['anomaly_score']:.3f}")
+        lines.append(f"   Is Anomaly: {result['bert_data']['is_anomaly']}")
+        lines.append(f"   Confidence: {result['bert_data']['confidence']:.1f}%")
     
     if result.get('search_query'):
-        print(f"\n🔍 Search Query: {result['search_query']}")
+        lines.append(f"\n🔍 Search Query: {result['search_query']}")
     
     if result.get('search_sources'):
-        print(f"\n🌐 Found {len(result['search_sources'])} threat intelligence sources")
+        lines.append(f"\n🌐 Found {len(result['search_sources'])} threat intelligence sources")
     
-    print(f"\n📝 Explanation:\n{result['explanation']}")
+    lines.append(f"\n📝 Explanation:\n{result['explanation']}")
     
     if result.get('recommended_actions'):
-        print(f"\n✅ Recommended Actions:")
+        lines.append(f"\n✅ Recommended Actions:")
         for i, action in enumerate(result['recommended_actions'], 1):
-            print(f"   {i}. {action}")
+            lines.append(f"   {i}. {action}")
     
     # NEW: Display agent summary and actions
     if result.get('agent_summary'):
-        print("\n" + "="*70)
-        print("🎯 LANGCHAIN AGENT SUMMARY")
-        print("="*70)
-        print(f"\n{result['agent_summary']}")
+        lines.extend(["", sep, "🎯 LANGCHAIN AGENT SUMMARY", sep])
+        lines.append(f"\n{result['agent_summary']}")
     
     if result.get('agent_actions'):
-        print(f"\n🔧 Agent made {len(result['agent_actions'])} additional tool call(s):")
+        lines.append(f"\n🔧 Agent made {len(result['agent_actions'])} additional tool call(s):")
         for i, action in enumerate(result['agent_actions'], 1):
-            print(f"\n   {i}. Tool: {action['tool']}")
-            print(f"      Input: {action['tool_input'][:100]}...")
-            print(f"      Observation: {action['observation'][:150]}...")
+            lines.append(f"\n   {i}. Tool: {action['tool']}")
+            lines.append(f"      Input: {action['tool_input'][:100]}...")
+            lines.append(f"      Observation: {action['observation'][:150]}...")
     
-    print("\n" + "="*70)
-    print("Test completed successfully!")
-    print("="*70)
+    lines.extend(["", sep, "Test completed successfully!", sep, ""])
+    sys.stdout.write("\n".join(lines))
+
+
+def batch_test(logs):
+    """
+    Analyze several logs in one call, as a batch script would
+    
+    analyze_logs_sync runs the logs concurrently on one event loop and sends
+    their BERT detection through the batch endpoint, so the service calls of
+    different logs overlap instead of running back to back.
+    """
+    sep = "=" * 70
+    print(sep)
+    print(f"Batch-analyzing {len(logs)} logs")
+    print(sep)
+    
+    agent = CyberSecAgent(verbose=False)
+    results = agent.analyze_logs_sync(logs, use_brave_search=True)
+    
+    lines = []
+    for i, (log, result) in enumerate(zip(logs, results), 1):
+        lines.append(f"\n[{i}] {log[:80]}")
+        lines.append(f"    🎯 {result['threat_type']} | ⚠️  {result['severity']} | 📊 {result['confidence_score']:.2f}")
+    lines.extend(["", sep, "Batch test completed successfully!", sep, ""])
+    sys.stdout.write("\n".join(lines))
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Analyze each line of the test log as a separate log, concurrently"
+    )
+    args = parser.parse_args()
+    
     try:
-        test_agent()
+        if args.batch:
+            batch_test([line.strip() for line in TEST_LOG.splitlines() if line.strip()])
+        else:
+            test_agent()
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
@@ -0,0 +1,106 @@
+# Tests that failed analyses are not served from the agent's caches
+import asyncio
+
+import orjson
+import pytest
+
+from src.agent.cybersec_agent import CyberSecAgent
+from src.clients.llm_client import LLM_ERROR_PREFIX
+from src.tools.bert_tool import BertAnomalyTool
+
+
+LOG = "Failed password for admin from 203.0.113.42 port 55892 ssh2"
+
+ANALYSIS_JSON = orjson.dumps({
+    "threat_type": "Brute Force Attack",
+    "severity": "HIGH",
+    "confidence_score": 0.9,
+    "explanation": "Repeated failed logins for admin.",
+    "indicators_of_compromise": ["IP: 203.0.113.42"],
+    "recommended_actions": ["Block 203.0.113.42"]
+}).decode()
+
+
+class StubLLMClient:
+    """LLMClient stand-in that fails on demand and counts analysis calls"""
+    
+    def __init__(self):
+        self.fail = False
+        self.analysis_calls = 0
+    
+    async def ainvoke(self, prompt):
+        return f"{LLM_ERROR_PREFIX}: connection refused" if self.fail else "SSH brute force attack indicators"
+    
+    async def ainvoke_until(self, prompt, is_complete, format=None, system=None, on_progress=None):
+        if format is None:
+            return "SUMMARY: Brute force against SSH.\nTOOL_CALLS: NONE"
+        self.analysis_calls += 1
+        if self.fail:
+            return f"{LLM_ERROR_PREFIX}: connection refused"
+        return ANALYSIS_JSON
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    async def adetect(self, log_text):
+        return "BERT anomaly detection unavailable", None
+    
+    monkeypatch.setattr(BertAnomalyTool, "adetect", adetect)
+    return CyberSecAgent(llm_client=StubLLMClient(), verbose=False)
+
+
+def test_failed_analysis_is_not_cached(agent):
+    agent.llm_client.fail = True
+    failed = asyncio.run(agent.analyze_log(LOG, use_brave_search=False))
+    assert "error" in failed
+    
+    agent.llm_client.fail = False
+    result = asyncio.run(agent.analyze_log(LOG, use_brave_search=False))
+    assert agent.llm_client.analysis_calls == 2
+    assert "error" not in result
+    assert result["threat_type"] == "Brute Force Attack"
+
+
+def test_successful_analysis_is_cached(agent):
+    asyncio.run(agent.analyze_log(LOG, use_brave_search=False))
+    asyncio.run(agent.analyze_log(LOG, use_brave_search=False))
+    assert agent.llm_client.analysis_calls == 1
+
+
+def test_failed_summary_is_not_cached_or_templated(agent, monkeypatch):
+    monkeypatch.setattr("src.agent.cybersec_agent.settings.template_cache_size", 64)
+    summary_fails = {"value": True}
+    analyze = agent.llm_client.ainvoke_until
+    
+    async def ainvoke_until(prompt, is_complete, format=None, system=None, on_progress=None):
+        if format is None and summary_fails["value"]:
+            return f"{LLM_ERROR_PREFIX}: connection refused"
+        return await analyze(prompt, is_complete, format, system, on_progress)
+    
+    agent.llm_client.ainvoke_until = ainvoke_until
+    failed = asyncio.run(agent.analyze_log(LOG, use_brave_search=False))
+    assert "agent_error" in failed
+    
+    summary_fails["value"] = False
+    similar = LOG.replace("203.0.113.42", "203.0.113.43")
+    result = asyncio.run(agent.analyze_log(similar, use_brave_search=False))
+    assert agent.llm_client.analysis_calls == 2
+    assert "agent_error" not in result
+
+
+def test_failed_keyword_extraction_falls_back_and_is_not_cached(agent):
+    agent.llm_client.fail = True
+    keywords = asyncio.run(agent._extract_threat_keywords(LOG))
+    assert not keywords.startswith("Error")
+    assert keywords == agent._extract_keywords_fallback(LOG)
+    
+    agent.llm_client.fail = False
+    assert asyncio.run(agent._extract_threat_keywords(LOG)) == "SSH brute force attack indicators"
+
+
+def test_result_cache_size_zero_disables_caching(agent, monkeypatch):
+    monkeypatch.setattr("src.agent.cybersec_agent.settings.result_cache_size", 0)
+    first = asyncio.run(agent.analyze_log(LOG, use_brave_search=False))
+    second = asyncio.run(agent.analyze_log(LOG, use_brave_search=False))
+    assert "error" not in first and "error" not in second
+    assert agent.llm_client.analysis_calls == 2